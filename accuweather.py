@@ -0,0 +1,238 @@
+"""
+Клиент AccuWeather, через который идут все запросы к API:
+  - общий пул keep-alive соединений;
+  - одинаковые одновременные запросы объединяются в один (single-flight);
+  - суточная квота и лимит запросов в секунду в общей SQLite-базе (одни на все воркеры);
+  - повтор с экспоненциальной задержкой и джиттером на 429/5xx и сетевых ошибках.
+Базовый URL задаётся ACCUWEATHER_BASE_URL, поэтому клиент можно направить на локальную заглушку.
+"""
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import CACHE_DB, SqliteCache
+from metrics import UPSTREAM_ERRORS, UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+
+ACCUWEATHER_BASE_URL = os.getenv('ACCUWEATHER_BASE_URL', 'http://dataservice.accuweather.com')
+# Суточный лимит тарифа (общий для всех воркеров): бесплатный план AccuWeather - 50 запросов в сутки
+API_DAILY_LIMIT = int(os.getenv('API_DAILY_LIMIT', 50))
+# Лимит запросов в секунду (тоже общий для всех воркеров)
+API_RATE_PER_SECOND = float(os.getenv('API_RATE_PER_SECOND', 10))
+# Когда в суточной квоте остаётся столько запросов, переходим в режим деградации
+API_LOW_BUDGET = int(os.getenv('API_LOW_BUDGET', 5))
+API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', 3))
+API_BACKOFF_BASE = float(os.getenv('API_BACKOFF_BASE', 0.5))
+API_BACKOFF_MAX = float(os.getenv('API_BACKOFF_MAX', 8))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', 5))
+
+# Ключ локации и число дней в пути прогноза не нужны в метках метрик
+FORECAST_PATH = re.compile(r'^/forecasts/v1/daily/\d+day/.*$')
+
+
+def endpoint_label(path):
+    """Имя эндпоинта для метрик: /forecasts/v1/daily/5day/123 -> forecasts/v1/daily."""
+    if FORECAST_PATH.match(path):
+        return 'forecasts/v1/daily'
+    return path.strip('/')
+
+
+class UpstreamError(Exception):
+    """Запрос к AccuWeather не удался (после всех повторов)."""
+
+
+class BudgetExhausted(UpstreamError):
+    """Суточная квота запросов исчерпана."""
+
+
+class RateLimit(SqliteCache):
+    """
+    Лимит запросов в секунду, общий для всех процессов с одной базой:
+    счётчик запросов в текущем окне (1 секунда, а при rate < 1 - 1/rate секунд).
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS api_rate (
+            slot INTEGER PRIMARY KEY,
+            used INTEGER NOT NULL
+        );
+    '''
+
+    def __init__(self, rate, path=CACHE_DB):
+        super().__init__(path)
+        self.window_seconds = max(1.0, 1 / rate)
+        self.limit = max(1, int(rate * self.window_seconds))
+
+    def try_acquire(self):
+        """Засчитывает запрос в текущем окне. Возвращает 0 или сколько секунд ждать следующего окна."""
+        now = time.time()
+        window = int(now // self.window_seconds)
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO api_rate (slot, used) VALUES (?, 1) '
+                'ON CONFLICT (slot) DO UPDATE SET used = used + 1 WHERE used < ?',
+                (window, self.limit)
+            )
+            conn.execute('DELETE FROM api_rate WHERE slot < ?', (window - 1,))
+        if cursor.rowcount == 1:
+            return 0
+        return (window + 1) * self.window_seconds - now
+
+    def acquire(self):
+        """Засчитывает запрос, при необходимости дожидаясь следующего окна."""
+        while True:
+            wait_for = self.try_acquire()
+            if not wait_for:
+                return
+            time.sleep(wait_for)
+
+
+class DailyQuota(SqliteCache):
+    """
+    Суточная квота запросов, общая для всех процессов с одной базой:
+    счётчик на каждые UTC-сутки, увеличивается атомарно одной командой.
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS api_quota (
+            day TEXT PRIMARY KEY,
+            used INTEGER NOT NULL
+        );
+    '''
+
+    def __init__(self, limit, path=CACHE_DB):
+        super().__init__(path)
+        self.limit = limit
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM api_quota WHERE day < ?', (self._today(),))
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def used(self):
+        row = self._conn().execute('SELECT used FROM api_quota WHERE day = ?', (self._today(),)).fetchone()
+        return row[0] if row else 0
+
+    def remaining(self):
+        return max(0, self.limit - self.used())
+
+    def try_acquire(self):
+        """Засчитывает один запрос, если квота на сегодня не исчерпана."""
+        if self.limit <= 0:
+            return False
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO api_quota (day, used) VALUES (?, 1) '
+                'ON CONFLICT (day) DO UPDATE SET used = used + 1 WHERE used < ?',
+                (self._today(), self.limit)
+            )
+        return cursor.rowcount == 1
+
+
+class AccuWeatherClient:
+    """Общий клиент для всех запросов к AccuWeather (потокобезопасный)."""
+
+    def __init__(self, base_url=ACCUWEATHER_BASE_URL, pool_size=10,
+                 daily_limit=API_DAILY_LIMIT, rate_per_second=API_RATE_PER_SECOND,
+                 low_budget=API_LOW_BUDGET, max_retries=API_MAX_RETRIES, timeout=API_TIMEOUT,
+                 quota_path=CACHE_DB):
+        # quota_path - база для суточной квоты и лимита в секунду (общая для воркеров)
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+        self.daily_quota = DailyQuota(daily_limit, quota_path)
+        self.rate_limit = RateLimit(rate_per_second, quota_path)
+        self.low_budget = low_budget
+        self.max_retries = max_retries
+        self.timeout = timeout
+        # Запросы в процессе выполнения: ключ запроса -> Future с результатом
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def budget_low(self):
+        """True, если суточная квота почти исчерпана и стоит отдавать устаревшие данные из кэша."""
+        return self.daily_quota.remaining() <= self.low_budget
+
+    def get_json(self, path, params):
+        """
+        GET {base_url}{path} и разбор JSON.
+        Одинаковые запросы, пришедшие одновременно, выполняются один раз.
+        При неудаче выбрасывает UpstreamError.
+        """
+        key = (path, tuple(sorted(params.items())))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            future.set_result(self._fetch(path, params))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return future.result()
+
+    def _fetch(self, path, params):
+        url = self.base_url + path
+        endpoint = endpoint_label(path)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limit.acquire()
+            if not self.daily_quota.try_acquire():
+                UPSTREAM_ERRORS.inc(endpoint=endpoint, kind='budget')
+                raise BudgetExhausted(f"Суточная квота запросов исчерпана: {path}")
+
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                UPSTREAM_ERRORS.inc(endpoint=endpoint, kind='http')
+                error = UpstreamError(f"{response.status_code} от {path}")
+                retry_after = response.headers.get('Retry-After')
+            except requests.HTTPError as e:
+                # 4xx (кроме 429) повторять бессмысленно
+                UPSTREAM_ERRORS.inc(endpoint=endpoint, kind='http')
+                raise UpstreamError(str(e)) from e
+            except requests.Timeout as e:
+                UPSTREAM_ERRORS.inc(endpoint=endpoint, kind='timeout')
+                error = UpstreamError(str(e))
+            except ValueError as e:
+                # Ответ не разобрался как JSON
+                UPSTREAM_ERRORS.inc(endpoint=endpoint, kind='decode')
+                error = UpstreamError(str(e))
+            except requests.RequestException as e:
+                UPSTREAM_ERRORS.inc(endpoint=endpoint, kind='connection')
+                error = UpstreamError(str(e))
+            finally:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+
+            if attempt == self.max_retries:
+                raise error
+            time.sleep(self._backoff(attempt, retry_after))
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        """Экспоненциальная задержка с полным джиттером (или Retry-After от сервера)."""
+        if retry_after and retry_after.isdigit():
+            return min(API_BACKOFF_MAX, int(retry_after))
+        return random.uniform(0, min(API_BACKOFF_MAX, API_BACKOFF_BASE * 2 ** attempt))
@@ -1,18 +1,74 @@
-from flask import Flask, render_template, request, flash, redirect, url_for
+from flask import Flask, Response, jsonify, render_template, request, flash, redirect, url_for, session, stream_with_context
+import json
 import os
-import requests
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
+import click
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
-from dash import Dash, html, dcc
-import plotly.graph_objs as go
-import plotly.express as px
-import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from accuweather import AccuWeatherClient, BudgetExhausted, UpstreamError
+from cache import ForecastCache, GeoCache, MISSING, normalize_city, normalize_coords
+from forecast_series import parse_forecasts
+from metrics import STAGE_SECONDS, WAYPOINT_ERRORS_TOTAL, cache_stats_collector, instrument_app, registry
+from route_store import create_route_store
+from spatial import SNAP_RADIUS_KM, SpatialIndex, haversine_km, is_valid_point, polyline_length_km, resample_polyline
 
 load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY')
+# Сессия нужна на каждый запрос /weather (route_id для графиков), поэтому без ключа не запускаемся
+if not app.secret_key:
+    raise RuntimeError("Не задан SECRET_KEY: добавьте его в .env или окружение (одинаковый для всех воркеров)")
 API_KEY = os.getenv('API_KEY')
+instrument_app(app)
+
+# Как подключать графики Dash (/dash/):
+#   lazy - Dash и Plotly импортируются и собираются при первом запросе к /dash/;
+#   off  - только Flask, графики обслуживает отдельный воркер (см. dashboard.py)
+DASH_MODE = os.getenv('DASH_MODE', 'lazy')
+
+# Сколько городов маршрута обрабатываем параллельно (пул для формы /weather)
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', 8))
+# Общий дедлайн (в секундах) на обработку всего маршрута
+ROUTE_DEADLINE = float(os.getenv('ROUTE_DEADLINE', 15))
+# Ограничения JSON API маршрутов (/api/route)
+API_MAX_WAYPOINTS = int(os.getenv('API_MAX_WAYPOINTS', 500))
+API_ROUTE_DEADLINE = float(os.getenv('API_ROUTE_DEADLINE', 120))
+# Отдельный пул для /api/route: большие пакеты не отнимают потоки у формы
+API_MAX_WORKERS = int(os.getenv('API_MAX_WORKERS', 8))
+# Сколько задач одного пакета может одновременно стоять в пуле API,
+# чтобы длинный пакет не занимал его целиком
+API_ROUTE_MAX_IN_FLIGHT = int(os.getenv('API_ROUTE_MAX_IN_FLIGHT', 4))
+
+# Общий клиент AccuWeather: пул соединений, объединение запросов, квоты и повторы
+aw_client = AccuWeatherClient(pool_size=MAX_WORKERS + API_MAX_WORKERS)
+
+# Пулы потоков для параллельных запросов по городам маршрута
+route_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='route')
+api_route_executor = ThreadPoolExecutor(max_workers=API_MAX_WORKERS, thread_name_prefix='route-api')
+
+# Постоянный кэш геокодирования (SQLite + in-memory LRU)
+geo_cache = GeoCache()
+# Кэш прогнозов, общий для всех воркеров
+forecast_cache = ForecastCache()
+# При холодном ключе сразу берём 5-дневный прогноз, чтобы потом отдавать 1 и 3 дня из кэша
+FORECAST_PREFETCH_FULL = os.getenv('FORECAST_PREFETCH_FULL', '1') == '1'
+# Известные локации по координатам: точки рядом с ними не требуют геокодирования
+location_index = SpatialIndex()
+for known_location in geo_cache.positions():
+    location_index.insert(*known_location)
+# Маршруты пользователей для Dash (по route_id из сессии)
+route_store = create_route_store()
+
+# Счётчики кэшей отдаются в /metrics при каждом чтении
+registry.collector(cache_stats_collector({
+    'geo': geo_cache,
+    'forecast': forecast_cache,
+}))
 
 
 def get_location_info(city_name, api_key):
@@ -20,37 +76,100 @@ def get_location_info(city_name, api_key):
     Запрос к AccuWeather locations/v1/cities/search, 
     чтобы вернуть (location_key, latitude, longitude) для указанного города.
     Возвращает (None, None, None), если город не найден.
+    Если AccuWeather недоступен или квота исчерпана, выбрасывает UpstreamError.
+    Результаты (в том числе "не найден") берутся из geo_cache, если они там есть.
     """
-    url = 'http://dataservice.accuweather.com/locations/v1/cities/search'
+    language = 'ru-RU'
+    cache_key = normalize_city(city_name, language)
+    cached = geo_cache.get(cache_key)
+    if cached is not MISSING:
+        if cached:
+            location_index.insert(*cached)
+        return cached if cached else (None, None, None)
+
     params = {
         'apikey': api_key,
         'q': city_name,
-        'language': 'ru-RU'
+        'language': language
     }
     try:
-        response = requests.get(url, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
+        data = aw_client.get_json('/locations/v1/cities/search', params)
         if data:
             loc_key = data[0]['Key']
             lat = data[0]['GeoPosition']['Latitude']
             lon = data[0]['GeoPosition']['Longitude']
+            geo_cache.set(cache_key, (loc_key, lat, lon))
+            location_index.insert(loc_key, lat, lon)
             return loc_key, lat, lon
         else:
+            geo_cache.set(cache_key, None)
             return None, None, None
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Ошибка при запросе локации: {e}")
-        return None, None, None
+        raise
+
 
+def get_location_by_coords(lat, lon, api_key):
+    """
+    Запрос к AccuWeather locations/v1/cities/geoposition/search:
+    (location_key, latitude, longitude) ближайшей к точке локации.
+    Возвращает (None, None, None), если локация не найдена.
+    Если AccuWeather недоступен или квота исчерпана, выбрасывает UpstreamError.
+    Точка в пределах SNAP_RADIUS_KM от уже известной локации привязывается к ней без запроса.
+    """
+    language = 'ru-RU'
+    cache_key = normalize_coords(lat, lon, language)
+    cached = geo_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached if cached else (None, None, None)
+
+    nearby = location_index.nearest(lat, lon, SNAP_RADIUS_KM)
+    if nearby:
+        return nearby
+
+    params = {
+        'apikey': api_key,
+        'q': f'{lat},{lon}',
+        'language': language
+    }
+    try:
+        data = aw_client.get_json('/locations/v1/cities/geoposition/search', params)
+        if data:
+            loc_key = data['Key']
+            lat = data['GeoPosition']['Latitude']
+            lon = data['GeoPosition']['Longitude']
+            geo_cache.set(cache_key, (loc_key, lat, lon))
+            location_index.insert(loc_key, lat, lon)
+            return loc_key, lat, lon
+        else:
+            geo_cache.set(cache_key, None)
+            return None, None, None
+    except UpstreamError as e:
+        print(f"Ошибка при запросе локации по координатам: {e}")
+        raise
 
+
+@STAGE_SECONDS.time(stage='forecast')
 def get_daily_forecast(location_key, api_key, days=1):
     """
     Запрашиваем суточный (daily) прогноз на 1, 3 или 5 дней.
     Возвращаем список из n элементов (где n = 1,3,5).
+    Свежие данные берутся из forecast_cache (в том числе срезом более длинного прогноза).
+    Если квота почти исчерпана или API недоступен, отдаём устаревший прогноз из кэша,
+    а если его нет - выбрасываем UpstreamError.
     """
     if days not in [1, 3, 5]:
         days = 1
-    url = f'http://dataservice.accuweather.com/forecasts/v1/daily/{days}day/{location_key}'
+    cached = forecast_cache.get(location_key, days)
+    if cached is not MISSING:
+        return cached
+
+    if aw_client.budget_low:
+        stale = forecast_cache.get_stale(location_key, days)
+        if stale is not MISSING:
+            return stale
+
+    fetch_days = 5 if FORECAST_PREFETCH_FULL else days
     params = {
         'apikey': api_key,
         'metric': 'true',
@@ -58,13 +177,208 @@ def get_daily_forecast(location_key, api_key, days=1):
         'details': 'true'  # чтобы получать PrecipitationProbability и др.
     }
     try:
-        response = requests.get(url, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("DailyForecasts", [])
-    except requests.RequestException as e:
+        data = aw_client.get_json(f'/forecasts/v1/daily/{fetch_days}day/{location_key}', params)
+        forecasts = data.get("DailyForecasts", [])
+        if forecasts:
+            forecast_cache.set(location_key, fetch_days, forecasts)
+        return forecasts[:days]
+    except UpstreamError as e:
         print(f"Ошибка при запросе ежедневного прогноза: {e}")
-        return []
+        stale = forecast_cache.get_stale(location_key, days)
+        if stale is MISSING:
+            raise
+        return stale
+
+
+# Ошибки по отдельным точкам маршрута
+WAYPOINT_ERRORS = {
+    'invalid': "Ожидается название города или объект {\"lat\": ..., \"lon\": ...}",
+    'not_found': "Локация не найдена",
+    'timeout': "Превышено время ожидания",
+    'failed': "Внутренняя ошибка при обработке точки",
+    'upstream': "Сервис AccuWeather недоступен",
+    'quota': "Исчерпана суточная квота запросов к AccuWeather",
+}
+
+
+def waypoint_coords(waypoint):
+    """(lat, lon) для точки {'lat': ..., 'lon': ...} с корректными координатами, иначе None."""
+    if isinstance(waypoint, dict) and is_valid_point(waypoint.get('lat'), waypoint.get('lon')):
+        return waypoint['lat'], waypoint['lon']
+    return None
+
+
+@STAGE_SECONDS.time(stage='geocode')
+def resolve_waypoint(waypoint, api_key):
+    """
+    Точка маршрута: название города или {'lat': ..., 'lon': ...}.
+    Возвращает (location_key, lat, lon) или None, если точка задана некорректно.
+    """
+    if isinstance(waypoint, str) and waypoint.strip():
+        return get_location_info(waypoint.strip(), api_key)
+    coords = waypoint_coords(waypoint)
+    if coords:
+        return get_location_by_coords(*coords, api_key)
+    return None
+
+
+def group_waypoints(waypoints):
+    """
+    Группирует точки, которые почти наверняка дадут одну локацию: одинаковые названия городов
+    и координаты в пределах SNAP_RADIUS_KM от первой точки группы.
+    Возвращает { индекс первой точки группы: [индексы остальных точек] } в порядке маршрута.
+    """
+    groups = {}
+    names = {}                # нормализованное название -> индекс первой точки
+    clusters = SpatialIndex()  # первые точки групп координат
+    for index, waypoint in enumerate(waypoints):
+        coords = waypoint_coords(waypoint)
+        if coords:
+            nearby = clusters.nearest(*coords, SNAP_RADIUS_KM)
+            if nearby:
+                groups[nearby[0]].append(index)
+                continue
+            clusters.insert(index, *coords)
+        elif isinstance(waypoint, str) and waypoint.strip():
+            name = normalize_city(waypoint.strip())
+            if name in names:
+                groups[names[name]].append(index)
+                continue
+            names[name] = index
+        groups[index] = []
+    return groups
+
+
+def iter_route_forecasts(waypoints, api_key, days=1, deadline=ROUTE_DEADLINE,
+                         executor=route_executor, max_in_flight=MAX_WORKERS):
+    """
+    Параллельно обрабатывает точки маршрута в пуле executor: прогноз запрашивается
+    сразу, как только получен location_key. Точки с общим location_key получают
+    один прогноз на всех, и запрашивается он один раз.
+    Геокодируется только первая точка каждой группы (см. group_waypoints), остальные получают
+    её локацию; точка координат дальше SNAP_RADIUS_KM от этой локации геокодируется отдельно.
+    В пуле одновременно не больше max_in_flight задач этого маршрута:
+    следующая точка отправляется, когда освобождается место.
+    Генерирует (index, location, forecast_data, error) в порядке готовности:
+      location      - (location_key, lat, lon) или None
+      forecast_data - [DailyForecasts] (пустой список, если прогноза нет)
+      error         - None или ключ WAYPOINT_ERRORS
+    Точки, не уложившиеся в дедлайн, отдаются в конце с ошибкой 'timeout'.
+    """
+    pending = {}    # future -> ('geo', index) или ('forecast', location_key)
+    waiting = {}    # location_key -> [(index, location), ...], ждущие прогноза
+    forecasts = {}  # location_key -> [DailyForecasts], уже полученные прогнозы
+    groups = group_waypoints(waypoints)
+    queued = deque(groups)  # первые точки групп, ещё не отправленные в пул
+
+    def submit_queued():
+        while queued and len(pending) < max_in_flight:
+            index = queued.popleft()
+            pending[executor.submit(resolve_waypoint, waypoints[index], api_key)] = ('geo', index)
+
+    def group_members(index, location):
+        """Точка index и те точки её группы, которым подходит её локация."""
+        members = [index]
+        for member in groups.pop(index):
+            coords = waypoint_coords(waypoints[member])
+            if coords and location and location[0] and haversine_km(*coords, *location[1:]) > SNAP_RADIUS_KM:
+                groups[member] = []
+                queued.append(member)
+            else:
+                members.append(member)
+        return members
+
+    deadline_at = time.monotonic() + deadline
+    try:
+        submit_queued()
+        while pending:
+            timeout = max(0, deadline_at - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+
+            for future in done:
+                kind, value = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Ошибка в одной точке не должна обрывать весь маршрут
+                    if isinstance(e, BudgetExhausted):
+                        error = 'quota'
+                    elif isinstance(e, UpstreamError):
+                        error = 'upstream'
+                    else:
+                        print(f"Ошибка при обработке точки маршрута: {e!r}")
+                        error = 'failed'
+                    if kind == 'forecast':
+                        failed = waiting.pop(value)
+                    else:
+                        failed = [(index, None) for index in group_members(value, None)]
+                    for index, location in failed:
+                        WAYPOINT_ERRORS_TOTAL.inc(error=error)
+                        yield index, location, [], error
+                    continue
+
+                if kind == 'forecast':
+                    forecasts[value] = result
+                    for index, location in waiting.pop(value):
+                        yield index, location, forecasts[value], None
+                    continue
+
+                location = result
+                for index in group_members(value, location):
+                    if location is None:
+                        WAYPOINT_ERRORS_TOTAL.inc(error='invalid')
+                        yield index, None, [], 'invalid'
+                    elif not location[0]:
+                        WAYPOINT_ERRORS_TOTAL.inc(error='not_found')
+                        yield index, None, [], 'not_found'
+                    elif location[0] in forecasts:
+                        yield index, location, forecasts[location[0]], None
+                    elif location[0] in waiting:
+                        waiting[location[0]].append((index, location))
+                    else:
+                        waiting[location[0]] = [(index, location)]
+                        forecast_future = executor.submit(get_daily_forecast, location[0], api_key, days)
+                        pending[forecast_future] = ('forecast', location[0])
+            submit_queued()
+
+        timed_out = [value for kind, value in pending.values() if kind == 'geo'] + list(queued)
+        timed_out += [member for index in timed_out for member in groups[index]]
+        timed_out += [index for group in waiting.values() for index, _ in group]
+        for index in sorted(timed_out):
+            WAYPOINT_ERRORS_TOTAL.inc(error='timeout')
+            yield index, None, [], 'timeout'
+    finally:
+        # Клиент отключился или вышел дедлайн - не выполняем оставшиеся запросы
+        for future in pending:
+            future.cancel()
+
+
+@app.cli.command('warm-geocache')
+@click.argument('cities_file', type=click.File('r', encoding='utf-8'))
+def warm_geocache(cities_file):
+    """Заполняет кэш геокодирования городами из файла (по одному на строку)."""
+    cities = [line.strip() for line in cities_file if line.strip()]
+
+    def warm(city):
+        try:
+            return get_location_info(city, API_KEY)[0] is not None
+        except UpstreamError:
+            return None
+
+    results = list(route_executor.map(warm, cities))
+    click.echo(f"Городов в кэше: {results.count(True)} из {len(cities)}")
+    for city, found in zip(cities, results):
+        if found is False:
+            click.echo(f"Не удалось найти город: {city}")
+        elif found is None:
+            click.echo(f"Ошибка запроса к AccuWeather для города: {city}")
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/')
@@ -90,191 +404,131 @@ def get_weather():
     forecast_results = {}
     # Сохраняем координаты: { 'Город': (lat, lon), ... }
     coord_results = {}
-
-    for city in cities:
-        location_key, lat, lon = get_location_info(city, API_KEY)
-        if not location_key:
+    # Колонки прогноза для графиков: { 'Город': {'dates': [...], 'max_temp': [...], ...} }
+    series_results = {}
+
+    # Повторяющиеся города запрашиваем один раз
+    unique_cities = list(dict.fromkeys(cities))
+    city_results = {}
+    with STAGE_SECONDS.time(stage='route'):
+        for index, location, forecast_data, error in iter_route_forecasts(unique_cities, API_KEY, days=days):
+            city_results[unique_cities[index]] = (location, forecast_data, error)
+
+    # Собираем результаты в порядке ввода
+    for city in unique_cities:
+        location, forecast_data, error = city_results[city]
+        if error == 'timeout':
+            flash(f"Превышено время ожидания для города: {city}")
+            continue
+        if error == 'failed':
+            flash(f"Ошибка при получении прогноза для города: {city}")
+            continue
+        if error in ('upstream', 'quota'):
+            flash(f"{WAYPOINT_ERRORS[error]}, не удалось получить прогноз для города: {city}")
+            continue
+        if error:
             flash(f"Не удалось найти город: {city}")
             continue
 
-        forecast_data = get_daily_forecast(location_key, API_KEY, days=days)
+        _, lat, lon = location
         forecast_results[city] = forecast_data
         coord_results[city] = (lat, lon)
+        series_results[city] = parse_forecasts(forecast_data)
 
-    # Сохраняем всё для Dash
-    global g_route_data
-    g_route_data = {
+    # Сохраняем всё для Dash под отдельным route_id, который кладём в сессию пользователя
+    route_id = uuid.uuid4().hex
+    route_store.set(route_id, {
         'days': days,
-        'cities_order': cities,             # порядок ввода (важно для линии маршрута)
-        'forecast_data': forecast_results,  # { city: [DailyForecasts] }
+        # Порядок ввода с повторами (важно для линии маршрута: A -> B -> A), без ненайденных городов
+        'cities_order': [c for c in cities if c in forecast_results],
+        'series': series_results,           # { city: {'dates': [...], 'max_temp': [...], ...} }
         'coords_data': coord_results        # { city: (lat, lon) }
-    }
+    })
+    session['route_id'] = route_id
+
+    with STAGE_SECONDS.time(stage='render'):
+        return render_template('weather_result.html', results=forecast_results, days=days)
+
 
-    return render_template('weather_result.html', results=forecast_results, days=days)
-
-
-# Инициализируем Dash для более гибкой визуализации
-dash_app = Dash(__name__, server=app, url_base_pathname='/dash/', external_stylesheets=[dbc.themes.BOOTSTRAP])
-
-dash_app.layout = dbc.Container([
-    html.H1("Прогноз погоды для маршрута", style={'marginTop': 20}),
-
-    # Выбор параметра для графика
-    html.Div(id='controls-container', children=[
-        dcc.Dropdown(
-            id='param-dropdown',
-            options=[
-                {'label': 'Максимальная температура', 'value': 'max_temp'},
-                {'label': 'Минимальная температура', 'value': 'min_temp'},
-                {'label': 'Вероятность осадков (днём)', 'value': 'day_precip'},
-                {'label': 'Вероятность осадков (ночью)', 'value': 'night_precip'}
-            ],
-            value='max_temp',
-            clearable=False
-        )
-    ], style={'marginBottom': 20}),
-
-    # График прогноза
-    dcc.Graph(id='weather-graph', style={'marginTop': 20}),
-
-    html.H2("Карта маршрута", style={'marginTop': 40}),
-    # График с картой
-    dcc.Graph(id='map-graph', style={'marginTop': 20, 'height': '600px'}),
-
-    html.Div([
-        dcc.Link('Вернуться на главную', href='/')
-    ], style={'marginTop': 20})
-], fluid=True)
-
-
-@dash_app.callback(
-    [Output('weather-graph', 'figure'),
-     Output('map-graph', 'figure')],
-    [Input('param-dropdown', 'value')]
-)
-def update_graphs(param):
-    global g_route_data
-    if 'g_route_data' not in globals() or not g_route_data:
-        # Если нет данных, возвращаем пустые фигуры
-        return go.Figure(), go.Figure()
-
-    days = g_route_data['days']
-    # Порядок городов, в каком пользователь их вводил (важно для рисования линии)
-    cities_order = g_route_data['cities_order']
-    forecast_dict = g_route_data['forecast_data']  # { city: [list_of_days], ... }
-    coords_dict = g_route_data['coords_data']      # { city: (lat, lon) }
-
-    # ========== (1) Линейный график прогноза ==========
-    fig_line = go.Figure()
-
-    for city in cities_order:
-        daily_list = forecast_dict[city]  # список дневных прогнозов для данного города
-
-        x_labels = []
-        y_values = []
-
-        for day_forecast in daily_list:
-            date_str = day_forecast.get('Date', '')
-            if param == 'max_temp':
-                val = day_forecast['Temperature']['Maximum']['Value']
-            elif param == 'min_temp':
-                val = day_forecast['Temperature']['Minimum']['Value']
-            elif param == 'day_precip':
-                val = day_forecast['Day'].get('PrecipitationProbability', 0)
-            elif param == 'night_precip':
-                val = day_forecast['Night'].get('PrecipitationProbability', 0)
+@app.route('/api/route', methods=['POST'])
+def api_route():
+    """
+    JSON API для длинных маршрутов.
+    Тело запроса: {"waypoints": ["Москва", {"lat": 55.75, "lon": 37.62}, ...], "days": 1|3|5}
+    Необязательное поле spacing_km: точки (только координаты) считаются ломаной
+    и заменяются равномерно расставленными вдоль неё с этим шагом.
+    Ответ - NDJSON: по одной записи на точку, в порядке готовности (поле index - номер точки).
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify(error="Тело запроса должно быть JSON-объектом"), 400
+    waypoints = body.get('waypoints')
+    days = body.get('days', 1)
+    spacing_km = body.get('spacing_km')
+
+    if not isinstance(waypoints, list) or not waypoints:
+        return jsonify(error="Поле waypoints должно быть непустым списком"), 400
+    if type(days) is not int or days not in (1, 3, 5):
+        return jsonify(error="Поле days должно быть 1, 3 или 5"), 400
+
+    if spacing_km is not None:
+        if (isinstance(spacing_km, bool) or not isinstance(spacing_km, (int, float))
+                or not 0 < spacing_km < float('inf')):
+            return jsonify(error="Поле spacing_km должно быть положительным числом"), 400
+        polyline = [waypoint_coords(w) for w in waypoints]
+        if not all(polyline):
+            return jsonify(error="Для spacing_km все точки должны быть корректными координатами"), 400
+        if polyline_length_km(polyline) / spacing_km + 2 > API_MAX_WAYPOINTS:
+            return jsonify(error=f"Слишком много точек: максимум {API_MAX_WAYPOINTS}"), 400
+        waypoints = [{'lat': lat, 'lon': lon} for lat, lon in resample_polyline(polyline, spacing_km)]
+
+    if len(waypoints) > API_MAX_WAYPOINTS:
+        return jsonify(error=f"Слишком много точек: максимум {API_MAX_WAYPOINTS}"), 400
+
+    def generate():
+        # Колонки прогноза разбираем один раз на location_key
+        series = {}
+        for index, location, forecast_data, error in iter_route_forecasts(
+                waypoints, API_KEY, days=days, deadline=API_ROUTE_DEADLINE,
+                executor=api_route_executor, max_in_flight=API_ROUTE_MAX_IN_FLIGHT):
+            record = {'index': index, 'query': waypoints[index]}
+            if error:
+                record['error'] = WAYPOINT_ERRORS[error]
             else:
-                val = 0
-
-            short_date = date_str.split('T')[0] if 'T' in date_str else date_str
-            x_labels.append(short_date)
-            y_values.append(val)
-
-        fig_line.add_trace(go.Scatter(
-            x=x_labels,
-            y=y_values,
-            mode='lines+markers',
-            name=city
-        ))
-
-    param_name = {
-        'max_temp': 'Макс. температура (°C)',
-        'min_temp': 'Мин. температура (°C)',
-        'day_precip': 'Осадки днём (%)',
-        'night_precip': 'Осадки ночью (%)'
-    }
-    fig_line.update_layout(
-        title=f"Прогноз на {days} дн.",
-        xaxis_title="Дата",
-        yaxis_title=param_name.get(param, 'Значение'),
-        template='plotly_white'
-    )
-
-    # ========== (2) Карта маршрута ==========
-    # Соберём массив широт/долгот в том порядке, как ввёл пользователь (это важно для рисования линии)
-    lat_list = []
-    lon_list = []
-    hover_texts = []
-
-    for city in cities_order:
-        lat, lon = coords_dict[city]
-        lat_list.append(lat)
-        lon_list.append(lon)
-
-        # Для более подробной информации во всплывающей подсказке возьмём первый день прогноза (или любой другой)
-        if forecast_dict[city]:
-            day0 = forecast_dict[city][0]
-            max_t = day0['Temperature']['Maximum']['Value']
-            min_t = day0['Temperature']['Minimum']['Value']
-            day_p = day0['Day'].get('PrecipitationProbability', 0)
-            night_p = day0['Night'].get('PrecipitationProbability', 0)
-            # Можно вывести ещё описание и т.п.
-            txt = (f"{city}\n"
-                   f"Макс. темп: {max_t}°C\n"
-                   f"Мин. темп: {min_t}°C\n"
-                   f"Осадки днём: {day_p}%\n"
-                   f"Осадки ночью: {night_p}%")
-        else:
-            txt = f"{city}\nНет данных о погоде"
-
-        hover_texts.append(txt)
-
-    # 2.1 trace: Линия маршрута (соединяем точки в порядке ввода)
-    route_trace = go.Scattermapbox(
-        lat=lat_list,
-        lon=lon_list,
-        mode='lines',  # только линия
-        line=dict(width=3, color='blue'),
-        name='Маршрут'
-    )
-
-    # 2.2 trace: Маркеры городов (с подсказками)
-    markers_trace = go.Scattermapbox(
-        lat=lat_list,
-        lon=lon_list,
-        mode='markers+text',
-        marker=go.scattermapbox.Marker(size=10, color='red'),
-        text=cities_order,          # названия городов на карте
-        textposition='top center',  # положение подписи
-        hovertext=hover_texts,
-        hoverinfo='text',
-        name='Города'
-    )
-
-    fig_map = go.Figure()
-    fig_map.add_trace(route_trace)
-    fig_map.add_trace(markers_trace)
-
-    # Настройки карты
-    fig_map.update_layout(
-        mapbox_style="open-street-map",  # не требует токена
-        mapbox_zoom=3,
-        mapbox_center={"lat": lat_list[0], "lon": lon_list[0]} if lat_list else {"lat": 55, "lon": 40},
-        margin={"r":0, "t":0, "l":0, "b":0}
-    )
-    fig_map.update_layout(title="Карта маршрута")
-
-    return fig_line, fig_map
+                location_key, lat, lon = location
+                record.update(location_key=location_key, lat=lat, lon=lon)
+                if not forecast_data:
+                    record['error'] = "Прогноз недоступен"
+                else:
+                    if location_key not in series:
+                        series[location_key] = parse_forecasts(forecast_data)
+                    record['forecast'] = series[location_key]
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+class LazyDashApp:
+    """
+    WSGI-приложение для /dash/, которое импортирует Dash и Plotly
+    и собирает графики только при первом обращении.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    from dashboard import create_dash_server
+                    self._app = create_dash_server(route_store)
+        return self._app(environ, start_response)
+
+
+if DASH_MODE == 'lazy':
+    app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {'/dash': LazyDashApp()})
 
 
 if __name__ == '__main__':
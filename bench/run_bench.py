@@ -0,0 +1,206 @@
+"""
+Нагрузочный тест приложения без расходования квоты AccuWeather.
+Поднимает заглушку API (stub_server.py) в фоновом потоке, а само приложение -
+в отдельном процессе (werkzeug), чтобы генератор нагрузки не делил с ним GIL и память. Затем для каждой комбинации длины маршрута и числа клиентов прогоняет
+POST /weather и callback'и Dash: первое открытие страницы (график и карта)
+и переключение параметра (только график).
+
+    python bench/run_bench.py --routes 1,10,50,200 --clients 1,8 --requests 20 --output bench.json
+
+Результат - JSON: p50/p95/p99 задержки (мс), пропускная способность, число вызовов API
+на запрос и пиковый RSS процесса приложения (VmHWM из /proc, только Linux).
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from stub_server import start_stub_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Выполняется в отдельном процессе: поднимает приложение и печатает его порт
+SERVE_APP = '''
+import logging
+from werkzeug.serving import make_server
+import app
+# Журнал каждого запроса от werkzeug только мешает читать отчёт
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+server = make_server('127.0.0.1', 0, app.app, threaded=True)
+print(server.server_port, flush=True)
+server.serve_forever()
+'''
+
+
+def dash_payload(output_id, input_id, input_property, value):
+    """Тело запроса, которое браузер отправляет в callback Dash с одним входом и одним выходом."""
+    return {
+        'output': f'{output_id}.figure',
+        'outputs': {'id': output_id, 'property': 'figure'},
+        'inputs': [{'id': input_id, 'property': input_property, 'value': value}],
+        'changedPropIds': [f'{input_id}.{input_property}'],
+        'state': []
+    }
+
+
+def line_payload(param):
+    """График прогноза: при открытии страницы и при смене param-dropdown."""
+    return dash_payload('weather-graph', 'param-dropdown', 'value', param)
+
+
+# Карта: один раз при открытии страницы
+MAP_PAYLOAD = dash_payload('map-graph', 'url', 'pathname', '/dash/')
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def latency_summary(seconds):
+    return {f'p{p}': round(percentile(seconds, p) * 1000, 1) for p in (50, 95, 99)} if seconds else None
+
+
+def process_memory_kb(pid):
+    """{'peak_rss_kb': VmHWM, 'rss_kb': VmRSS} процесса pid из /proc (None, если /proc нет)."""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return {'peak_rss_kb': None, 'rss_kb': None}
+    return {'peak_rss_kb': int(fields['VmHWM'].split()[0]), 'rss_kb': int(fields['VmRSS'].split()[0])}
+
+
+def start_app(env):
+    """Запускает приложение в отдельном процессе. Возвращает (процесс, базовый URL)."""
+    process = subprocess.Popen([sys.executable, '-c', SERVE_APP], cwd=ROOT, env=env,
+                               stdout=subprocess.PIPE, text=True)
+    port = process.stdout.readline().strip()
+    if not port:
+        process.kill()
+        raise RuntimeError("Приложение не запустилось")
+    return process, f'http://127.0.0.1:{port}'
+
+
+def run_scenario(base_url, app_pid, stub, name, route_len, clients, requests_count, days, cache):
+    """Прогоняет requests_count пользовательских сценариев в clients параллельных потоках."""
+    stub.state.reset()
+    timings = {'weather': [], 'dash_first': [], 'dash_switch': []}
+    errors = 0
+    lock = threading.Lock()
+
+    def one_user(n):
+        nonlocal errors
+        if cache == 'cold':
+            # Уникальные города - каждый запрос идёт мимо кэшей
+            cities = [f'{name}-{n}-{i}' for i in range(route_len)]
+        else:
+            cities = [f'Город-{i}' for i in range(route_len)]
+
+        with requests.Session() as session:
+            dash_url = f'{base_url}/dash/_dash-update-component'
+            steps = [
+                ('weather', lambda: [session.post(f'{base_url}/weather', data={'cities': cities, 'days': days})]),
+                ('dash_first', lambda: [session.post(dash_url, json=line_payload('max_temp')),
+                                        session.post(dash_url, json=MAP_PAYLOAD)]),
+                ('dash_switch', lambda: [session.post(dash_url, json=line_payload('day_precip'))]),
+            ]
+            for step, send in steps:
+                started = time.perf_counter()
+                responses = send()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    timings[step].append(elapsed)
+                    errors += sum(not response.ok for response in responses)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(one_user, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    upstream = stub.state.stats()
+    return {
+        'name': name,
+        'route_len': route_len,
+        'clients': clients,
+        'requests': requests_count,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests_count / elapsed, 2),
+        'latency_ms': {step: latency_summary(values) for step, values in timings.items()},
+        'upstream_calls_per_request': round(upstream['total'] / requests_count, 2),
+        'upstream_calls': upstream['calls'],
+        # VmHWM - максимум за всё время жизни процесса приложения, включая предыдущие сценарии
+        'app_memory': process_memory_kb(app_pid),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест с заглушкой AccuWeather")
+    parser.add_argument('--routes', default='1,10,50,200', help="длины маршрутов через запятую")
+    parser.add_argument('--clients', default='1,8', help="числа параллельных клиентов через запятую")
+    parser.add_argument('--requests', type=int, default=20, help="запросов на сценарий")
+    parser.add_argument('--days', type=int, default=5, choices=[1, 3, 5])
+    parser.add_argument('--cache', default='cold', choices=['cold', 'warm'],
+                        help="cold - уникальные города в каждом запросе, warm - одни и те же")
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка заглушки, с")
+    parser.add_argument('--jitter', type=float, default=0.02, help="разброс задержки заглушки, с")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 503 от заглушки")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--route-store', default='sqlite', choices=['sqlite', 'memory'])
+    parser.add_argument('--output', help="файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=args.latency, jitter=args.jitter,
+                             error_rate=args.error_rate, seed=args.seed)
+    env = dict(os.environ, **{
+        'ACCUWEATHER_BASE_URL': 'http://%s:%d' % stub.server_address,
+        'API_KEY': 'bench',
+        'SECRET_KEY': 'bench',
+        'API_DAILY_LIMIT': '1000000000',
+        'API_RATE_PER_SECOND': '100000',
+        'CACHE_DIR': tempfile.mkdtemp(prefix='weather-bench-'),
+        'ROUTE_STORE': args.route_store,
+    })
+    app_process, base_url = start_app(env)
+
+    scenarios = []
+    try:
+        for route_len in [int(r) for r in args.routes.split(',')]:
+            for clients in [int(c) for c in args.clients.split(',')]:
+                name = f'route{route_len}-clients{clients}'
+                print(f"Сценарий {name}...", file=sys.stderr)
+                scenarios.append(run_scenario(base_url, app_process.pid, stub, name, route_len, clients,
+                                              args.requests, args.days, args.cache))
+        app_memory = process_memory_kb(app_process.pid)
+    finally:
+        app_process.terminate()
+        app_process.wait()
+        stub.shutdown()
+
+    report = {
+        'settings': vars(args),
+        'python': sys.version.split()[0],
+        'scenarios': scenarios,
+        'app_memory': app_memory,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Замер времени запуска Flask-части приложения (import app) в чистом процессе.
+Проверяет, что время импорта укладывается в бюджет и что при импорте
+не подгружаются библиотеки визуализации (они нужны только для /dash/).
+
+    python bench/startup_bench.py --runs 5 --budget-ms 500 --output startup.json
+
+Код возврата 1, если бюджет превышен или подгрузилась тяжёлая библиотека.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которых не должно быть в процессе после import app
+HEAVY_MODULES = ('dash', 'plotly', 'dash_bootstrap_components', 'numpy', 'pandas')
+
+# Выполняется в отдельном процессе, чтобы каждый замер был "холодным"
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_ms": round(elapsed * 1000, 1),
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def measure_once(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бюджет времени запуска Flask-части приложения")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', 500)))
+    parser.add_argument('--output', help="файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, SECRET_KEY='bench', API_KEY='bench',
+               CACHE_DIR=tempfile.mkdtemp(prefix='weather-startup-'))
+    runs = [measure_once(env) for _ in range(args.runs)]
+    times = [run['import_ms'] for run in runs]
+    heavy = sorted({m for run in runs for m in run['heavy_modules']})
+    median_ms = statistics.median(times)
+
+    report = {
+        'budget_ms': args.budget_ms,
+        'median_ms': median_ms,
+        'max_ms': max(times),
+        'runs_ms': times,
+        'heavy_modules': heavy,
+        'ok': median_ms <= args.budget_ms and not heavy,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
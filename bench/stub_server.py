@@ -0,0 +1,163 @@
+"""
+Локальная заглушка AccuWeather API для нагрузочных тестов.
+Отвечает на те же запросы, что использует приложение:
+  /locations/v1/cities/search?q=...
+  /locations/v1/cities/geoposition/search?q=lat,lon
+  /forecasts/v1/daily/{n}day/{location_key}
+Задержка, джиттер и доля ошибок (503) настраиваются, fail_first - сколько первых запросов ответят 503.
+Служебные пути: /__stats - счётчики вызовов, /__reset - сброс счётчиков.
+
+Запуск отдельно:
+    python bench/stub_server.py --port 8001 --latency 0.1 --jitter 0.05 --error-rate 0.01
+и затем приложение с ACCUWEATHER_BASE_URL=http://127.0.0.1:8001
+"""
+import argparse
+import datetime
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FORECAST_PATH = re.compile(r'^/forecasts/v1/daily/(\d+)day/([^/]+)$')
+
+
+def _location(key):
+    """Детерминированная локация для ключа: одинаковый запрос - одинаковый ответ."""
+    h = zlib.crc32(key.encode('utf-8'))
+    return {
+        'Key': str(h),
+        'LocalizedName': key,
+        'GeoPosition': {'Latitude': round(-60 + h % 12000 / 100, 4),
+                        'Longitude': round(-180 + (h >> 8) % 36000 / 100, 4)}
+    }
+
+
+def _daily_forecasts(location_key, days):
+    h = zlib.crc32(location_key.encode('utf-8'))
+    today = datetime.date.today()
+    forecasts = []
+    for i in range(days):
+        min_t = (h + i) % 30 - 10
+        forecasts.append({
+            'Date': f'{today + datetime.timedelta(days=i)}T07:00:00+03:00',
+            'Temperature': {'Minimum': {'Value': min_t, 'Unit': 'C'},
+                            'Maximum': {'Value': min_t + 8, 'Unit': 'C'}},
+            'Day': {'PrecipitationProbability': (h + 7 * i) % 100},
+            'Night': {'PrecipitationProbability': (h + 13 * i) % 100},
+        })
+    return forecasts
+
+
+class StubState:
+    """Настройки заглушки и счётчики вызовов по эндпоинтам."""
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, seed=None, fail_first=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.random = random.Random(seed)
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.error_rate
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                fail = True
+        return delay, fail
+
+    def stats(self):
+        with self.lock:
+            return {'calls': dict(self.calls), 'total': sum(self.calls.values())}
+
+    def reset(self):
+        with self.lock:
+            self.calls = {}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящего API
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == '/__stats':
+            return self._send(200, state.stats())
+        if url.path == '/__reset':
+            state.reset()
+            return self._send(200, {'ok': True})
+
+        match = FORECAST_PATH.match(url.path)
+        if url.path == '/locations/v1/cities/search':
+            endpoint = 'cities/search'
+        elif url.path == '/locations/v1/cities/geoposition/search':
+            endpoint = 'cities/geoposition/search'
+        elif match:
+            endpoint = 'daily'
+        else:
+            return self._send(404, {'Message': 'Not found'})
+
+        delay, fail = state.record(endpoint)
+        time.sleep(delay)
+        if fail:
+            return self._send(503, {'Message': 'Service unavailable'})
+
+        if endpoint == 'cities/search':
+            q = query.get('q', '')
+            # Заглушка "не находит" города, в названии которых есть notfound
+            return self._send(200, [] if 'notfound' in q.lower() else [_location(q)])
+        if endpoint == 'cities/geoposition/search':
+            return self._send(200, _location('geo:' + query.get('q', '')))
+        days, location_key = int(match.group(1)), match.group(2)
+        return self._send(200, {'Headline': {}, 'DailyForecasts': _daily_forecasts(location_key, days)})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host='127.0.0.1', port=0, **settings):
+    """Запускает заглушку в фоновом потоке. Возвращает сервер (адрес - server.server_address)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка AccuWeather API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка ответа, с")
+    parser.add_argument('--jitter', type=float, default=0.0, help="разброс задержки, с")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(args.latency, args.jitter, args.error_rate, args.seed)
+    print(f"Заглушка AccuWeather: http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Кэши для ответов AccuWeather.
+Данные хранятся в SQLite-файле (переживает перезапуск и общий для всех воркеров),
+а перед кэшем геокодирования стоит небольшой in-memory LRU, чтобы не ходить в базу на каждый запрос.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+CACHE_DB = os.path.join(CACHE_DIR, 'weather_cache.sqlite3')
+
+# Город -> (Key, lat, lon) почти не меняется, поэтому храним долго
+GEO_TTL = int(os.getenv('GEO_TTL', 30 * 24 * 3600))
+# "Город не найден" храним недолго: пользователь мог опечататься, а справочник - обновиться
+GEO_NEGATIVE_TTL = int(os.getenv('GEO_NEGATIVE_TTL', 3600))
+GEO_MEMORY_SIZE = int(os.getenv('GEO_MEMORY_SIZE', 1024))
+
+# Суточный прогноз AccuWeather обновляется несколько раз в сутки
+FORECAST_TTL = int(os.getenv('FORECAST_TTL', 3600))
+
+# Признак промаха кэша (None зарезервирован под "город не найден")
+MISSING = object()
+
+
+def normalize_city(city_name, language='ru-RU'):
+    """
+    Нормализует название города для ключа кэша:
+    регистр, лишние пробелы, ё/е и язык запроса.
+    """
+    name = ' '.join(city_name.split()).casefold().replace('ё', 'е')
+    return f"{language.lower()}:{name}"
+
+
+def normalize_coords(lat, lon, language='ru-RU'):
+    """Ключ кэша для поиска по координатам: округление до ~1 км."""
+    return f"{language.lower()}:geo:{lat:.2f},{lon:.2f}"
+
+
+class CacheStats:
+    """Счётчики обращений к кэшу (для /metrics)."""
+    stat_names = ('hits', 'misses')
+
+    def _init_stats(self):
+        self._stats = dict.fromkeys(self.stat_names, 0)
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+class LRUCache(CacheStats):
+    """Потокобезопасный in-memory LRU с TTL на каждую запись."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._init_stats()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] < time.time():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self._count('misses')
+                return MISSING
+            self._data.move_to_end(key)
+            self._count('hits')
+            return entry[0]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+class SqliteCache:
+    """
+    Базовый класс для кэшей в SQLite.
+    У каждого потока своё соединение, WAL позволяет читать из нескольких процессов.
+    """
+    schema = ''
+
+    def __init__(self, path=CACHE_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.schema)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+
+class GeoCache(SqliteCache, CacheStats):
+    """
+    Кэш геокодирования: нормализованное название города -> (Key, lat, lon).
+    Отрицательные результаты (город не найден) хранятся как None с коротким TTL.
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS geocode (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            expires_at REAL NOT NULL
+        );
+    '''
+
+    def __init__(self, path=CACHE_DB, ttl=GEO_TTL, negative_ttl=GEO_NEGATIVE_TTL,
+                 memory_size=GEO_MEMORY_SIZE):
+        super().__init__(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = LRUCache(memory_size)
+        self._init_stats()
+        self.purge()
+
+    def get(self, key):
+        """Возвращает (Key, lat, lon), None для "не найден" или MISSING при промахе."""
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count('hits')
+            return value
+
+        row = self._conn().execute(
+            'SELECT value, expires_at FROM geocode WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            self._count('misses')
+            return MISSING
+        value = tuple(json.loads(row[0])) if row[0] is not None else None
+        self.memory.set(key, value, row[1])
+        self._count('hits')
+        return value
+
+    def set(self, key, value):
+        """Сохраняет (Key, lat, lon) или None, если город не найден."""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        expires_at = time.time() + ttl
+        payload = json.dumps(list(value)) if value is not None else None
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO geocode (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, payload, expires_at)
+            )
+        self.memory.set(key, value, expires_at)
+
+    def positions(self):
+        """Все известные локации из базы: [(Key, lat, lon), ...] без повторов."""
+        rows = self._conn().execute(
+            'SELECT DISTINCT value FROM geocode WHERE value IS NOT NULL AND expires_at > ?',
+            (time.time(),)
+        ).fetchall()
+        return [tuple(json.loads(row[0])) for row in rows]
+
+    def purge(self):
+        """Удаляет из базы просроченные записи."""
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM geocode WHERE expires_at <= ?', (time.time(),))
+
+
+class ForecastCache(SqliteCache, CacheStats):
+    """
+    Кэш суточных прогнозов: location_key -> список DailyForecasts на N дней.
+    Более короткий горизонт отдаётся срезом более длинного (5 дней -> 1 или 3).
+    Считает попадания, промахи, устаревшие записи и отданные устаревшие данные (stats()).
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS forecast (
+            location_key TEXT PRIMARY KEY,
+            days INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+    '''
+    stat_names = ('hits', 'misses', 'stale', 'stale_served')
+
+    def __init__(self, path=CACHE_DB, ttl=FORECAST_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+        self._init_stats()
+
+    def get(self, location_key, days):
+        """Возвращает список из days прогнозов или MISSING, если свежих данных нет."""
+        row = self._conn().execute(
+            'SELECT days, payload, fetched_at FROM forecast WHERE location_key = ?',
+            (location_key,)
+        ).fetchone()
+        if row is None or row[0] < days:
+            self._count('misses')
+            return MISSING
+        if row[2] + self.ttl < time.time():
+            self._count('stale')
+            return MISSING
+        self._count('hits')
+        return json.loads(row[1])[:days]
+
+    def get_stale(self, location_key, days):
+        """
+        Как get(), но без учёта TTL - для режима деградации,
+        когда лучше показать устаревший прогноз, чем пустой.
+        """
+        row = self._conn().execute(
+            'SELECT days, payload FROM forecast WHERE location_key = ?',
+            (location_key,)
+        ).fetchone()
+        if row is None or row[0] < days:
+            return MISSING
+        self._count('stale_served')
+        return json.loads(row[1])[:days]
+
+    def set(self, location_key, days, forecasts):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO forecast (location_key, days, payload, fetched_at) '
+                'VALUES (?, ?, ?, ?)',
+                (location_key, days, json.dumps(forecasts, ensure_ascii=False), time.time())
+            )
@@ -0,0 +1,224 @@
+"""
+Интерактивные графики маршрута (Dash + Plotly).
+Тяжёлые библиотеки импортируются только здесь: основное приложение подключает
+этот модуль при первом запросе к /dash/ (DASH_MODE=lazy).
+
+Графики можно запустить и отдельным воркером, чтобы основное приложение обходилось без Dash:
+    DASH_MODE=off gunicorn app:app
+    gunicorn 'dashboard:create_wsgi_app()'
+и направить /dash/ на второй процесс. Маршруты при этом должны храниться в общем хранилище (ROUTE_STORE=sqlite).
+"""
+import os
+import time
+
+import dash_bootstrap_components as dbc
+import numpy as np
+import plotly.graph_objs as go
+from dash import Dash, html, dcc
+from dash.dependencies import Input, Output
+from flask import Flask, session
+from werkzeug.exceptions import NotFound
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+from cache import LRUCache, MISSING
+from forecast_series import SERIES_PARAMS
+from metrics import STAGE_SECONDS, cache_stats_collector, instrument_app, registry
+from route_store import ROUTE_TTL, create_route_store
+
+# Построенные фигуры Dash: ('line', route_id, param) и ('map', route_id)
+figure_cache = LRUCache(int(os.getenv('FIGURE_CACHE_SIZE', 256)))
+registry.collector(cache_stats_collector({'figure': figure_cache}))
+
+
+def to_arrays(series, param):
+    """
+    Даты (datetime64[D]) и значения параметра param в виде массивов NumPy.
+    Переводится только нужная колонка; для неизвестного параметра - нули.
+    """
+    dates = np.array(series['dates'], dtype='datetime64[D]')
+    if param not in SERIES_PARAMS:
+        return dates, np.zeros(len(dates))
+    return dates, np.asarray(series[param], dtype=float)
+
+
+def build_layout():
+    """Страница /dash/: выбор параметра, график прогноза и карта маршрута."""
+    return dbc.Container([
+        # Карта строится один раз при загрузке страницы (см. update_map)
+        dcc.Location(id='url', refresh=False),
+        html.H1("Прогноз погоды для маршрута", style={'marginTop': 20}),
+
+        # Выбор параметра для графика
+        html.Div(id='controls-container', children=[
+            dcc.Dropdown(
+                id='param-dropdown',
+                options=[
+                    {'label': 'Максимальная температура', 'value': 'max_temp'},
+                    {'label': 'Минимальная температура', 'value': 'min_temp'},
+                    {'label': 'Вероятность осадков (днём)', 'value': 'day_precip'},
+                    {'label': 'Вероятность осадков (ночью)', 'value': 'night_precip'}
+                ],
+                value='max_temp',
+                clearable=False
+            )
+        ], style={'marginBottom': 20}),
+
+        # График прогноза
+        dcc.Graph(id='weather-graph', style={'marginTop': 20}),
+
+        html.H2("Карта маршрута", style={'marginTop': 40}),
+        # График с картой
+        dcc.Graph(id='map-graph', style={'marginTop': 20, 'height': '600px'}),
+
+        html.Div([
+            dcc.Link('Вернуться на главную', href='/')
+        ], style={'marginTop': 20})
+    ], fluid=True)
+
+
+@STAGE_SECONDS.time(stage='figure_line')
+def build_line_figure(route_data, param):
+    """Линейный график прогноза по выбранному параметру для всех городов маршрута."""
+    fig_line = go.Figure()
+
+    # Повторные остановки маршрута - тот же город, на графике он нужен один раз
+    for city in dict.fromkeys(route_data['cities_order']):
+        dates, values = to_arrays(route_data['series'][city], param)
+        fig_line.add_trace(go.Scatter(
+            x=dates,
+            y=values,
+            mode='lines+markers',
+            name=city
+        ))
+
+    param_name = {
+        'max_temp': 'Макс. температура (°C)',
+        'min_temp': 'Мин. температура (°C)',
+        'day_precip': 'Осадки днём (%)',
+        'night_precip': 'Осадки ночью (%)'
+    }
+    fig_line.update_layout(
+        title=f"Прогноз на {route_data['days']} дн.",
+        xaxis_title="Дата",
+        yaxis_title=param_name.get(param, 'Значение'),
+        template='plotly_white'
+    )
+    return fig_line
+
+
+@STAGE_SECONDS.time(stage='figure_map')
+def build_map_figure(route_data):
+    """Карта маршрута. От выбранного параметра не зависит, поэтому строится один раз на маршрут."""
+    # Порядок городов, в каком пользователь их вводил (важно для рисования линии)
+    cities_order = route_data['cities_order']
+    series_dict = route_data['series']       # { city: {'dates': [...], 'max_temp': [...], ...} }
+    coords_dict = route_data['coords_data']  # { city: (lat, lon) }
+
+    lat_list = []
+    lon_list = []
+    hover_texts = []
+
+    for city in cities_order:
+        lat, lon = coords_dict[city]
+        lat_list.append(lat)
+        lon_list.append(lon)
+
+        # Для более подробной информации во всплывающей подсказке возьмём первый день прогноза
+        series = series_dict[city]
+        if series['dates']:
+            txt = (f"{city}\n"
+                   f"Макс. темп: {series['max_temp'][0]}°C\n"
+                   f"Мин. темп: {series['min_temp'][0]}°C\n"
+                   f"Осадки днём: {series['day_precip'][0]}%\n"
+                   f"Осадки ночью: {series['night_precip'][0]}%")
+        else:
+            txt = f"{city}\nНет данных о погоде"
+
+        hover_texts.append(txt)
+
+    # Линия маршрута (соединяем точки в порядке ввода)
+    route_trace = go.Scattermapbox(
+        lat=lat_list,
+        lon=lon_list,
+        mode='lines',  # только линия
+        line=dict(width=3, color='blue'),
+        name='Маршрут'
+    )
+
+    # Маркеры городов (с подсказками)
+    markers_trace = go.Scattermapbox(
+        lat=lat_list,
+        lon=lon_list,
+        mode='markers+text',
+        marker=go.scattermapbox.Marker(size=10, color='red'),
+        text=cities_order,          # названия городов на карте
+        textposition='top center',  # положение подписи
+        hovertext=hover_texts,
+        hoverinfo='text',
+        name='Города'
+    )
+
+    fig_map = go.Figure()
+    fig_map.add_trace(route_trace)
+    fig_map.add_trace(markers_trace)
+
+    # Настройки карты
+    fig_map.update_layout(
+        mapbox_style="open-street-map",  # не требует токена
+        mapbox_zoom=3,
+        mapbox_center={"lat": lat_list[0], "lon": lon_list[0]} if lat_list else {"lat": 55, "lon": 40},
+        margin={"r":0, "t":0, "l":0, "b":0}
+    )
+    fig_map.update_layout(title="Карта маршрута")
+    return fig_map
+
+
+def create_dash_server(route_store):
+    """
+    Отдельный Flask-сервер с Dash для /dash/.
+    Сессию (route_id) читает по тому же SECRET_KEY, что и основное приложение.
+    """
+    server = Flask(__name__)
+    server.secret_key = os.getenv('SECRET_KEY')
+    if not server.secret_key:
+        raise RuntimeError("Не задан SECRET_KEY: без него графики не увидят маршрут из сессии")
+    instrument_app(server)
+
+    # Сервер смонтирован на /dash, поэтому свои пути он видит от корня
+    dash_app = Dash(__name__, server=server, routes_pathname_prefix='/', requests_pathname_prefix='/dash/',
+                    external_stylesheets=[dbc.themes.BOOTSTRAP])
+    dash_app.layout = build_layout()
+
+    def cached_figure(key, build):
+        """Фигура маршрута из сессии: из figure_cache, а при промахе - build(route_data)."""
+        route_id = session.get('route_id')
+        if not route_id:
+            # Если нет данных, возвращаем пустую фигуру
+            return go.Figure()
+
+        cache_key = (key[0], route_id) + key[1:]
+        figure = figure_cache.get(cache_key)
+        if figure is MISSING:
+            route_data = route_store.get(route_id)
+            if not route_data:
+                return go.Figure()
+            figure = build(route_data)
+            figure_cache.set(cache_key, figure, time.time() + ROUTE_TTL)
+        return figure
+
+    @dash_app.callback(Output('weather-graph', 'figure'), [Input('param-dropdown', 'value')])
+    def update_graphs(param):
+        return cached_figure(('line', param), lambda route_data: build_line_figure(route_data, param))
+
+    # Карта не зависит от параметра: отправляется один раз при загрузке страницы,
+    # а не при каждой смене param-dropdown
+    @dash_app.callback(Output('map-graph', 'figure'), [Input('url', 'pathname')])
+    def update_map(pathname):
+        return cached_figure(('map',), build_map_figure)
+
+    return server
+
+
+def create_wsgi_app():
+    """WSGI-приложение для отдельного воркера графиков: отвечает только на /dash/."""
+    return DispatcherMiddleware(NotFound(), {'/dash': create_dash_server(create_route_store())})
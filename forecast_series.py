@@ -0,0 +1,25 @@
+"""
+Колоночное представление прогнозов маршрута.
+Вложенные словари AccuWeather разбираются один раз при получении прогноза,
+а графики потом строятся из готовых массивов по каждому параметру.
+"""
+
+# Параметр графика -> как достать значение из элемента DailyForecasts
+SERIES_PARAMS = {
+    'max_temp': lambda day: day['Temperature']['Maximum']['Value'],
+    'min_temp': lambda day: day['Temperature']['Minimum']['Value'],
+    'day_precip': lambda day: day['Day'].get('PrecipitationProbability', 0),
+    'night_precip': lambda day: day['Night'].get('PrecipitationProbability', 0),
+}
+
+
+def parse_forecasts(daily_list):
+    """
+    [DailyForecasts] -> {'dates': ['YYYY-MM-DD', ...], 'max_temp': [...], ...}
+    Колонки - обычные списки, чтобы их можно было сохранить в route_store как JSON.
+    """
+    series = {'dates': [day.get('Date', '').split('T')[0] for day in daily_list]}
+    for param, extract in SERIES_PARAMS.items():
+        series[param] = [extract(day) for day in daily_list]
+    return series
+
@@ -0,0 +1,266 @@
+"""
+Встроенные метрики в формате Prometheus и профилировщик по запросу.
+Счётчики и гистограммы - обычные словари под блокировкой,
+так что их можно держать включёнными в продакшене.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+
+from flask import g, request
+
+# Границы гистограмм по умолчанию, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Профилировщик включается заголовком X-Profile, значение которого совпадает с PROFILE_TOKEN
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.profiles'))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+# Потоки пулов маршрутов (route_*, route-api_*): геокодирование и прогнозы выполняются в них
+PROFILE_THREAD_PREFIX = 'route'
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # ключ меток -> [счётчики по корзинам (+Inf последней), сумма]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса и функций, которые отдают значения в момент чтения."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """
+        func() -> [(name, type, documentation, [(labels dict, value), ...]), ...]
+        Вызывается при каждом чтении /metrics.
+        """
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for func in self._collectors:
+            for name, metric_type, documentation, samples in func():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(tuple(labels), tuple(labels.values()))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'weather_stage_seconds', "Время этапов обработки запроса", ['stage'])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'weather_http_request_seconds', "Время обработки HTTP-запроса (до начала ответа)", ['rule', 'method'])
+UPSTREAM_SECONDS = registry.histogram(
+    'weather_upstream_request_seconds', "Время одного запроса к AccuWeather", ['endpoint'])
+UPSTREAM_REQUESTS = registry.counter(
+    'weather_upstream_requests_total', "Запросы к AccuWeather по статусу ответа", ['endpoint', 'status'])
+UPSTREAM_ERRORS = registry.counter(
+    'weather_upstream_errors_total', "Ошибки запросов к AccuWeather", ['endpoint', 'kind'])
+WAYPOINT_ERRORS_TOTAL = registry.counter(
+    'weather_waypoint_errors_total', "Точки маршрута, для которых не удалось получить прогноз", ['error'])
+
+
+def cache_stats_collector(caches):
+    """
+    Коллектор для кэшей с методом stats() -> {'hits': ..., 'misses': ..., ...}.
+    caches - словарь {имя: кэш}.
+    """
+    def collect():
+        requests_samples = []
+        ratio_samples = []
+        for name, cache in caches.items():
+            stats = cache.stats()
+            for result, value in sorted(stats.items()):
+                requests_samples.append(({'cache': name, 'result': result}, value))
+            lookups = stats.get('hits', 0) + stats.get('misses', 0) + stats.get('stale', 0)
+            ratio_samples.append(({'cache': name}, stats.get('hits', 0) / lookups if lookups else 0))
+        return [
+            ('weather_cache_requests_total', 'counter', "Обращения к кэшам по результату", requests_samples),
+            ('weather_cache_hit_ratio', 'gauge', "Доля попаданий в кэш", ratio_samples),
+        ]
+    return collect
+
+
+def instrument_app(flask_app):
+    """
+    Подключает к Flask-приложению замер времени запросов и профилировщик по заголовку X-Profile.
+    Профилировщик работает, только если задан PROFILE_TOKEN и заголовок с ним совпадает.
+    """
+    @flask_app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if PROFILE_TOKEN and request.headers.get('X-Profile') == PROFILE_TOKEN:
+            g.profiler = SamplingProfiler(threading.get_ident(), PROFILE_THREAD_PREFIX).start()
+
+    @flask_app.after_request
+    def observe_request(response):
+        rule = request.script_root + request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, rule=rule, method=request.method)
+
+        profiler = g.pop('profiler', None)
+        if profiler:
+            # Останавливаем после отправки тела, чтобы потоковые ответы тоже попали в профиль
+            name = f"{int(time.time() * 1000)}-{request.endpoint}"
+            response.headers['X-Profile-File'] = f'{name}.folded'
+
+            def stop_profiler():
+                profiler.stop()
+                profiler.dump(name)
+            response.call_on_close(stop_profiler)
+        return response
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик: раз в interval секунд снимает стек потока thread_id
+    и стеки занятых задачами потоков, чьё имя начинается с thread_prefix,
+    и считает одинаковые стеки (формат folded stacks для flamegraph, корень - имя потока).
+    Потоки пулов общие, поэтому в профиль попадает и работа параллельных запросов.
+    """
+
+    def __init__(self, thread_id, thread_prefix=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.thread_prefix = thread_prefix
+        self.interval = interval
+        self.stacks = StackCounter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _sampled_threads(self):
+        """{ident: имя} потоков, которые нужно сэмплировать."""
+        threads = {}
+        for thread in threading.enumerate():
+            if thread.ident == self.thread_id or (
+                    self.thread_prefix and thread.name.startswith(self.thread_prefix)):
+                threads[thread.ident] = thread.name
+        return threads
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, thread_name in self._sampled_threads().items():
+                frame = frames.get(ident)
+                stack = []
+                busy = ident == self.thread_id
+                while frame is not None:
+                    code = frame.f_code
+                    # Поток пула занят, если в его стеке выполняется задача (_WorkItem.run)
+                    busy = busy or (code.co_name == 'run' and code.co_filename.endswith(
+                        os.path.join('concurrent', 'futures', 'thread.py')))
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                if stack and busy:
+                    stack.append(thread_name)
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, name):
+        """Сохраняет стеки в PROFILE_DIR/<name>.folded и возвращает путь к файлу."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f'{name}.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
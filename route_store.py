@@ -0,0 +1,112 @@
+"""
+Хранилище маршрутов для Dash: route_id -> данные маршрута.
+Данные хранятся в сжатом виде (JSON + zlib), объём ограничен по числу записей (LRU) и по времени (TTL).
+Бэкенд 'memory' живёт внутри процесса, 'sqlite' - общий для всех воркеров.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from cache import CACHE_DB, SqliteCache
+
+ROUTE_STORE = os.getenv('ROUTE_STORE', 'sqlite')
+ROUTE_TTL = int(os.getenv('ROUTE_TTL', 3600))
+ROUTE_MAX_ENTRIES = int(os.getenv('ROUTE_MAX_ENTRIES', 1000))
+
+
+def pack_route(route):
+    return zlib.compress(json.dumps(route, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_route(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+class MemoryRouteStore:
+    """Маршруты в памяти процесса (подходит для одного воркера)."""
+
+    def __init__(self, ttl=ROUTE_TTL, max_entries=ROUTE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, route_id):
+        with self._lock:
+            entry = self._data.get(route_id)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at < time.time():
+                del self._data[route_id]
+                return None
+            self._data.move_to_end(route_id)
+        return unpack_route(payload)
+
+    def set(self, route_id, route):
+        payload = pack_route(route)
+        with self._lock:
+            self._data[route_id] = (payload, time.time() + self.ttl)
+            self._data.move_to_end(route_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class SqliteRouteStore(SqliteCache):
+    """Маршруты в SQLite-файле: видны всем воркерам, которые его открыли."""
+    schema = '''
+        CREATE TABLE IF NOT EXISTS routes (
+            route_id TEXT PRIMARY KEY,
+            payload BLOB NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS routes_accessed_at ON routes (accessed_at);
+    '''
+
+    def __init__(self, path=CACHE_DB, ttl=ROUTE_TTL, max_entries=ROUTE_MAX_ENTRIES):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, route_id):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT payload FROM routes WHERE route_id = ? AND expires_at > ?',
+            (route_id, now)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE routes SET accessed_at = ? WHERE route_id = ?', (now, route_id))
+        return unpack_route(row[0])
+
+    def set(self, route_id, route):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO routes (route_id, payload, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?)',
+                (route_id, pack_route(route), now + self.ttl, now)
+            )
+            # Вытесняем просроченные и самые давно использованные маршруты
+            conn.execute('DELETE FROM routes WHERE expires_at <= ?', (now,))
+            conn.execute(
+                'DELETE FROM routes WHERE route_id IN ('
+                '  SELECT route_id FROM routes ORDER BY accessed_at DESC LIMIT -1 OFFSET ?'
+                ')',
+                (self.max_entries,)
+            )
+
+
+def create_route_store(backend=ROUTE_STORE):
+    if backend == 'memory':
+        return MemoryRouteStore()
+    if backend == 'sqlite':
+        return SqliteRouteStore()
+    raise ValueError(f"Неизвестный бэкенд хранилища маршрутов: {backend}")
@@ -0,0 +1,126 @@
+"""
+Пространственный индекс известных локаций AccuWeather.
+Точки маршрута, лежащие в нескольких километрах от уже известной локации,
+привязываются к её location_key без запроса геокодирования.
+"""
+import math
+import os
+import threading
+from collections import defaultdict
+
+# Радиус (км), в котором точка считается той же локацией
+SNAP_RADIUS_KM = float(os.getenv('SNAP_RADIUS_KM', 5))
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Расстояние по дуге большого круга между двумя точками, км."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def is_valid_point(lat, lon):
+    """True, если lat и lon - числа (не bool) в пределах [-90, 90] и [-180, 180]. NaN и inf не проходят."""
+    for value in (lat, lon):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+    return -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def polyline_length_km(points):
+    """Длина ломаной [(lat, lon), ...], км."""
+    return sum(haversine_km(lat1, lon1, lat2, lon2)
+               for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]))
+
+
+def resample_polyline(points, spacing_km):
+    """
+    Равномерно расставляет точки вдоль ломаной [(lat, lon), ...] с шагом spacing_km.
+    Первая и последняя точки ломаной сохраняются.
+    Отрезок через 180-й меридиан проходится коротким путём.
+    """
+    if len(points) < 2:
+        return list(points)
+
+    result = [points[0]]
+    since_last = 0.0  # пройдено от последней поставленной точки
+    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+        segment = haversine_km(lat1, lon1, lat2, lon2)
+        dlon = (lon2 - lon1 + 180) % 360 - 180
+        offset = spacing_km - since_last
+        while offset <= segment:
+            t = offset / segment
+            result.append((lat1 + (lat2 - lat1) * t, (lon1 + dlon * t + 180) % 360 - 180))
+            offset += spacing_km
+        since_last = segment - (offset - spacing_km)
+
+    if result[-1] != tuple(points[-1]):
+        result.append(tuple(points[-1]))
+    return result
+
+
+class SpatialIndex:
+    """
+    Сетка из ячеек cell_km x cell_km (по широте): location_key -> (lat, lon).
+    Поиск ближайшей локации просматривает только соседние ячейки,
+    по долготе сетка замкнута (ячейки у 180-го меридиана - соседние).
+    """
+
+    def __init__(self, cell_km=SNAP_RADIUS_KM):
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        # По долготе ячейки чуть шире, чтобы их целое число укладывалось в 360 градусов
+        self.lon_cells = max(1, math.floor(360 / self.cell_deg))
+        self.lon_cell_deg = 360 / self.lon_cells
+        self._cells = defaultdict(dict)  # (i, j) -> { location_key: (lat, lon) }
+        self._key_cells = {}             # location_key -> (i, j)
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor((lon + 180) % 360 / self.lon_cell_deg) % self.lon_cells
+
+    def __len__(self):
+        return len(self._key_cells)
+
+    def insert(self, location_key, lat, lon):
+        cell = self._cell(lat, lon)
+        with self._lock:
+            old_cell = self._key_cells.get(location_key)
+            if old_cell == cell:
+                return
+            if old_cell is not None:
+                del self._cells[old_cell][location_key]
+            self._cells[cell][location_key] = (lat, lon)
+            self._key_cells[location_key] = cell
+
+    def nearest(self, lat, lon, max_km=SNAP_RADIUS_KM):
+        """Ближайшая известная локация не дальше max_km: (location_key, lat, lon) или None."""
+        ci, cj = self._cell(lat, lon)
+        di = math.ceil(max_km / self.cell_km)
+        # Ячейки по долготе сужаются к полюсам, поэтому по долготе смотрим шире:
+        # с запасом на самую близкую к полюсу широту в радиусе поиска
+        lat_reach = abs(lat) + max_km / KM_PER_DEGREE
+        if lat_reach < 90:
+            km_per_column = KM_PER_DEGREE * math.cos(math.radians(lat_reach)) * self.lon_cell_deg
+            dj = math.ceil(max_km / km_per_column)
+        if lat_reach >= 90 or 2 * dj + 1 >= self.lon_cells:
+            columns = range(self.lon_cells)
+        else:
+            columns = [j % self.lon_cells for j in range(cj - dj, cj + dj + 1)]
+
+        best = None
+        best_km = max_km
+        with self._lock:
+            for i in range(ci - di, ci + di + 1):
+                for j in columns:
+                    for location_key, (key_lat, key_lon) in self._cells.get((i, j), {}).items():
+                        distance = haversine_km(lat, lon, key_lat, key_lon)
+                        if distance <= best_km:
+                            best = (location_key, key_lat, key_lon)
+                            best_km = distance
+        return best
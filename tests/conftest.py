@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Модули приложения лежат в корне репозитория, заглушка API - в bench/
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'bench')]
+
+# Настройки читаются при импорте модулей, поэтому задаём их до сбора тестов:
+# кэши - во временном каталоге, квоты - без ограничений
+os.environ.update({
+    'CACHE_DIR': tempfile.mkdtemp(prefix='weather-tests-'),
+    'API_KEY': 'test',
+    'SECRET_KEY': 'test',
+    'API_DAILY_LIMIT': '1000000000',
+    'API_RATE_PER_SECOND': '100000',
+    'ROUTE_STORE': 'sqlite',
+})
+
+from stub_server import start_stub_server  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """Фабрика заглушек AccuWeather: stub(latency=..., error_rate=..., fail_first=...)."""
+    servers = []
+
+    def start(**settings):
+        settings.setdefault('latency', 0)
+        server = start_stub_server(**settings)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def weather_app(stub, monkeypatch):
+    """
+    Фабрика: поднимает заглушку с настройками и направляет на неё клиент приложения.
+    Возвращает (модуль app, сервер заглушки). Кэши общие на все тесты, поэтому
+    в тестах приложения лучше брать уникальные названия городов (unique_city).
+    """
+    import app
+
+    def make(**settings):
+        server = stub(**settings)
+        monkeypatch.setattr(app.aw_client, 'base_url', 'http://%s:%d' % server.server_address)
+        return app, server
+    return make
+
+
+def unique_city(prefix='Город'):
+    return f'{prefix}-{uuid.uuid4().hex[:8]}'
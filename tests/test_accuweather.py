@@ -0,0 +1,90 @@
+"""Клиент AccuWeather против локальной заглушки API (bench/stub_server.py)."""
+import threading
+import time
+
+import pytest
+
+import accuweather
+from accuweather import AccuWeatherClient, BudgetExhausted, UpstreamError
+
+SEARCH = '/locations/v1/cities/search'
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(accuweather, 'API_BACKOFF_BASE', 0.001)
+    monkeypatch.setattr(accuweather, 'API_BACKOFF_MAX', 0.01)
+
+
+def make_client(server, tmp_path, **kwargs):
+    base_url = 'http://%s:%d' % server.server_address
+    return AccuWeatherClient(base_url, quota_path=str(tmp_path / 'quota.sqlite3'), **kwargs)
+
+
+def test_concurrent_identical_requests_are_coalesced(stub, tmp_path):
+    server = stub(latency=0.3)
+    client = make_client(server, tmp_path)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def call():
+        barrier.wait()
+        results.append(client.get_json(SEARCH, {'q': 'Москва'}))
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    assert all(result == results[0] for result in results)
+    assert server.state.stats()['total'] == 1
+
+
+def test_retries_on_503(stub, tmp_path):
+    server = stub(fail_first=2)
+    client = make_client(server, tmp_path, max_retries=3)
+
+    data = client.get_json(SEARCH, {'q': 'Казань'})
+
+    assert data[0]['LocalizedName'] == 'Казань'
+    assert server.state.stats()['total'] == 3
+
+
+def test_gives_up_after_max_retries(stub, tmp_path):
+    server = stub(error_rate=1.0)
+    client = make_client(server, tmp_path, max_retries=2)
+
+    with pytest.raises(UpstreamError):
+        client.get_json(SEARCH, {'q': 'Омск'})
+    assert server.state.stats()['total'] == 3
+
+
+def test_daily_quota_is_shared_between_clients(stub, tmp_path):
+    server = stub()
+    first = make_client(server, tmp_path, daily_limit=2, low_budget=0)
+    second = make_client(server, tmp_path, daily_limit=2, low_budget=0)
+
+    first.get_json(SEARCH, {'q': 'Тверь'})
+    second.get_json(SEARCH, {'q': 'Псков'})
+
+    assert first.budget_low
+    with pytest.raises(BudgetExhausted):
+        first.get_json(SEARCH, {'q': 'Пермь'})
+    with pytest.raises(BudgetExhausted):
+        second.get_json(SEARCH, {'q': 'Пермь'})
+    assert server.state.stats()['total'] == 2
+
+
+def test_rate_limit_is_shared_between_clients(stub, tmp_path):
+    server = stub()
+    clients = [make_client(server, tmp_path, rate_per_second=5) for _ in range(2)]
+
+    started = time.monotonic()
+    for i in range(11):
+        clients[i % 2].get_json(SEARCH, {'q': f'Город {i}'})
+
+    # 11 запросов при 5 в секунду на обоих клиентах - минимум три окна
+    assert time.monotonic() - started >= 1
+    assert server.state.stats()['total'] == 11
@@ -0,0 +1,84 @@
+"""JSON API маршрутов /api/route: проверка тела запроса и потоковый NDJSON-ответ."""
+import json
+
+import pytest
+
+from conftest import unique_city
+
+
+def post_route(client, body, **kwargs):
+    if isinstance(body, str):
+        return client.post('/api/route', data=body, content_type='application/json', **kwargs)
+    return client.post('/api/route', json=body, **kwargs)
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('body, message', [
+    ('[1, 2]', "JSON-объектом"),
+    ('"Москва"', "JSON-объектом"),
+    ('не json', "JSON-объектом"),
+    ({'waypoints': []}, "waypoints"),
+    ({'waypoints': 'Москва'}, "waypoints"),
+    ({'waypoints': ['Москва'], 'days': 2}, "days"),
+    ({'waypoints': ['Москва'], 'days': 3.0}, "days"),
+    ({'waypoints': ['Москва'], 'days': True}, "days"),
+    ({'waypoints': [{'lat': 0, 'lon': 0}, {'lat': 0, 'lon': 1}], 'spacing_km': 0}, "spacing_km"),
+    ({'waypoints': [{'lat': 0, 'lon': 0}, {'lat': 0, 'lon': 1}], 'spacing_km': True}, "spacing_km"),
+    ({'waypoints': ['Москва', {'lat': 0, 'lon': 1}], 'spacing_km': 10}, "spacing_km"),
+])
+def test_invalid_requests_are_rejected_without_upstream_calls(weather_app, body, message):
+    app, server = weather_app()
+
+    response = post_route(app.app.test_client(), body)
+
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
+    assert server.state.stats()['total'] == 0
+
+
+def test_too_many_waypoints(weather_app, monkeypatch):
+    app, server = weather_app()
+    monkeypatch.setattr(app, 'API_MAX_WAYPOINTS', 2)
+
+    response = post_route(app.app.test_client(), {'waypoints': ['a', 'b', 'c']})
+
+    assert response.status_code == 400
+    assert server.state.stats()['total'] == 0
+
+
+def test_streams_one_record_per_waypoint(weather_app):
+    app, server = weather_app()
+    city = unique_city()
+    waypoints = [city, {'lat': float('nan'), 'lon': 0}, {'lat': True, 'lon': 0}, unique_city('notfound')]
+
+    response = post_route(app.app.test_client(), json.dumps({'waypoints': waypoints, 'days': 3}))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    records = {record['index']: record for record in read_ndjson(response)}
+    assert sorted(records) == [0, 1, 2, 3]
+
+    assert records[0]['query'] == city
+    assert records[0]['location_key']
+    assert len(records[0]['forecast']['dates']) == 3
+    assert len(records[0]['forecast']['max_temp']) == 3
+    assert records[1]['error'] == app.WAYPOINT_ERRORS['invalid']
+    assert records[2]['error'] == app.WAYPOINT_ERRORS['invalid']
+    assert records[3]['error'] == app.WAYPOINT_ERRORS['not_found']
+
+
+def test_spacing_km_resamples_coordinates(weather_app):
+    app, _ = weather_app()
+    # ~110 км вдоль параллели
+    waypoints = [{'lat': -40.0, 'lon': 100.0}, {'lat': -40.0, 'lon': 101.3}]
+
+    response = post_route(app.app.test_client(), {'waypoints': waypoints, 'spacing_km': 40})
+
+    records = read_ndjson(response)
+    assert len(records) == 4
+    queries = [record['query'] for record in sorted(records, key=lambda record: record['index'])]
+    assert queries[0] == waypoints[0] and queries[-1] == waypoints[-1]
+    assert all('error' not in record for record in records)
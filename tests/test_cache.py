@@ -0,0 +1,74 @@
+"""Кэши ответов AccuWeather."""
+import pytest
+
+from cache import MISSING, ForecastCache, GeoCache, normalize_city, normalize_coords
+
+FORECASTS = [{'Date': f'2024-06-0{i}T07:00:00+03:00'} for i in range(1, 6)]
+
+
+@pytest.fixture
+def forecast_cache(tmp_path):
+    return ForecastCache(str(tmp_path / 'cache.sqlite3'))
+
+
+def test_shorter_horizon_is_sliced_from_longer(forecast_cache):
+    forecast_cache.set('123', 5, FORECASTS)
+
+    assert forecast_cache.get('123', 1) == FORECASTS[:1]
+    assert forecast_cache.get('123', 3) == FORECASTS[:3]
+    assert forecast_cache.get('123', 5) == FORECASTS
+    assert forecast_cache.stats()['hits'] == 3
+
+
+def test_longer_horizon_is_a_miss(forecast_cache):
+    forecast_cache.set('123', 3, FORECASTS[:3])
+
+    assert forecast_cache.get('123', 5) is MISSING
+    assert forecast_cache.get('456', 1) is MISSING
+    assert forecast_cache.stats()['misses'] == 2
+
+
+def test_expired_forecast_is_served_only_as_stale(tmp_path):
+    cache = ForecastCache(str(tmp_path / 'cache.sqlite3'), ttl=-1)
+    cache.set('123', 5, FORECASTS)
+
+    assert cache.get('123', 3) is MISSING
+    assert cache.get_stale('123', 3) == FORECASTS[:3]
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'stale': 1, 'stale_served': 1}
+
+
+def test_normalize_city_folds_case_whitespace_and_yo():
+    assert normalize_city('  Орёл ') == normalize_city('орел') == 'ru-ru:орел'
+    assert normalize_city('Нижний   Новгород') == normalize_city('нижний новгород')
+    assert normalize_city('Орёл', 'en-US') != normalize_city('Орёл')
+
+
+def test_normalize_coords_rounds_to_two_digits():
+    assert normalize_coords(55.7512, 37.6184) == normalize_coords(55.749, 37.621) == 'ru-ru:geo:55.75,37.62'
+
+
+def test_geo_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    GeoCache(path).set('ru-ru:москва', ('294021', 55.75, 37.62))
+
+    cache = GeoCache(path)
+    assert cache.get('ru-ru:москва') == ('294021', 55.75, 37.62)
+    assert cache.get('ru-ru:москва') == ('294021', 55.75, 37.62)  # второй раз - из памяти
+    assert cache.get('ru-ru:тверь') is MISSING
+    assert cache.stats() == {'hits': 2, 'misses': 1}
+    assert cache.memory.stats()['hits'] == 1
+    assert cache.positions() == [('294021', 55.75, 37.62)]
+
+
+def test_geo_cache_negative_ttl(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = GeoCache(path, negative_ttl=3600)
+    cache.set('ru-ru:нетакого', None)
+    assert cache.get('ru-ru:нетакого') is None
+
+    # Просроченный отрицательный результат - снова промах, в том числе после перезапуска
+    expired = GeoCache(path, negative_ttl=-1)
+    expired.set('ru-ru:нетакого', None)
+    assert expired.get('ru-ru:нетакого') is MISSING
+    assert GeoCache(path).get('ru-ru:нетакого') is MISSING
+    assert GeoCache(path).positions() == []
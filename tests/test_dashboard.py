@@ -0,0 +1,86 @@
+"""Графики Dash: отдельные callback'и для графика и карты и кэш построенных фигур."""
+import pytest
+
+from conftest import unique_city
+
+pytest.importorskip('dash')
+
+DASH_URL = '/dash/_dash-update-component'
+
+
+def callback_payload(output_id, input_id, input_property, value):
+    return {
+        'output': f'{output_id}.figure',
+        'outputs': {'id': output_id, 'property': 'figure'},
+        'inputs': [{'id': input_id, 'property': input_property, 'value': value}],
+        'changedPropIds': [f'{input_id}.{input_property}'],
+        'state': []
+    }
+
+
+def line_figure(client, param):
+    response = client.post(DASH_URL, json=callback_payload('weather-graph', 'param-dropdown', 'value', param))
+    assert response.status_code == 200
+    return response.get_json()['response']
+
+
+def map_figure(client):
+    response = client.post(DASH_URL, json=callback_payload('map-graph', 'url', 'pathname', '/dash/'))
+    assert response.status_code == 200
+    return response.get_json()['response']
+
+
+@pytest.fixture
+def route_client(weather_app):
+    """Клиент с маршрутом A -> B -> A в сессии."""
+    app, _ = weather_app()
+    client = app.app.test_client()
+    first, second = unique_city(), unique_city()
+    client.post('/weather', data={'cities': [first, second, first], 'days': 3})
+    return client, first, second
+
+
+def test_param_switch_returns_only_the_line_figure(route_client):
+    client, first, second = route_client
+
+    response = line_figure(client, 'day_precip')
+
+    assert list(response) == ['weather-graph']
+    traces = response['weather-graph']['figure']['data']
+    assert [trace['name'] for trace in traces] == [first, second]
+    assert all(len(trace['y']) == 3 for trace in traces)
+
+
+def test_map_keeps_repeated_stops(route_client):
+    client, first, second = route_client
+
+    response = map_figure(client)
+
+    assert list(response) == ['map-graph']
+    markers = response['map-graph']['figure']['data'][1]
+    assert markers['text'] == [first, second, first]
+
+
+def test_figures_are_built_once_per_route(route_client, monkeypatch):
+    import dashboard
+    client, _, _ = route_client
+    builds = []
+    for name in ('build_line_figure', 'build_map_figure'):
+        original = getattr(dashboard, name)
+        monkeypatch.setattr(dashboard, name,
+                            lambda *args, _name=name, _original=original: builds.append(_name) or _original(*args))
+
+    for _ in range(3):
+        line_figure(client, 'max_temp')
+        map_figure(client)
+    line_figure(client, 'min_temp')
+
+    assert builds == ['build_line_figure', 'build_map_figure', 'build_line_figure']
+
+
+def test_no_route_in_session_gives_empty_figures(weather_app):
+    app, _ = weather_app()
+    client = app.app.test_client()
+
+    assert line_figure(client, 'max_temp')['weather-graph']['figure']['data'] == []
+    assert map_figure(client)['map-graph']['figure']['data'] == []
@@ -0,0 +1,77 @@
+"""Метрики в формате Prometheus."""
+from metrics import Registry, cache_stats_collector
+
+
+class FakeCache:
+    def __init__(self, stats):
+        self._stats = stats
+
+    def stats(self):
+        return self._stats
+
+
+def test_render_counters_histograms_and_collectors():
+    registry = Registry()
+    requests = registry.counter('test_requests_total', "Запросы", ['endpoint', 'status'])
+    seconds = registry.histogram('test_seconds', "Время", ['stage'], buckets=(0.1, 1))
+    registry.collector(cache_stats_collector({'geo': FakeCache({'hits': 3, 'misses': 1})}))
+
+    requests.inc(endpoint='daily', status=200)
+    requests.inc(2, endpoint='daily', status=200)
+    requests.inc(endpoint='search', status=503)
+    seconds.observe(0.05, stage='geocode')
+    seconds.observe(0.5, stage='geocode')
+    seconds.observe(5, stage='geocode')
+
+    assert registry.render() == '\n'.join([
+        '# HELP test_requests_total Запросы',
+        '# TYPE test_requests_total counter',
+        'test_requests_total{endpoint="daily",status="200"} 3',
+        'test_requests_total{endpoint="search",status="503"} 1',
+        '# HELP test_seconds Время',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{stage="geocode",le="0.1"} 1',
+        'test_seconds_bucket{stage="geocode",le="1"} 2',
+        'test_seconds_bucket{stage="geocode",le="+Inf"} 3',
+        'test_seconds_sum{stage="geocode"} 5.55',
+        'test_seconds_count{stage="geocode"} 3',
+        '# HELP weather_cache_requests_total Обращения к кэшам по результату',
+        '# TYPE weather_cache_requests_total counter',
+        'weather_cache_requests_total{cache="geo",result="hits"} 3',
+        'weather_cache_requests_total{cache="geo",result="misses"} 1',
+        '# HELP weather_cache_hit_ratio Доля попаданий в кэш',
+        '# TYPE weather_cache_hit_ratio gauge',
+        'weather_cache_hit_ratio{cache="geo"} 0.75',
+    ]) + '\n'
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    errors = registry.counter('test_errors_total', "Ошибки", ['kind'])
+    errors.inc(kind='say "hi"\\\n')
+
+    assert 'test_errors_total{kind="say \\"hi\\"\\\\\\n"} 1' in registry.render()
+
+
+def test_histogram_time_decorator_observes_each_call():
+    registry = Registry()
+    seconds = registry.histogram('test_seconds', "Время", ['stage'])
+
+    @seconds.time(stage='work')
+    def work():
+        return 42
+
+    assert work() == 42 and work() == 42
+    assert 'test_seconds_count{stage="work"} 2' in registry.render()
+
+
+def test_metrics_endpoint(weather_app):
+    app, _ = weather_app()
+
+    response = app.app.test_client().get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE weather_stage_seconds histogram' in text
+    assert 'weather_cache_hit_ratio{cache="forecast"}' in text
@@ -0,0 +1,152 @@
+"""Параллельная обработка маршрута: iter_route_forecasts, group_waypoints и форма /weather."""
+import pytest
+
+from cache import normalize_city
+from conftest import unique_city
+
+
+def run_route(app, waypoints, **kwargs):
+    """Результаты iter_route_forecasts по индексам точек: { index: (location, forecast_data, error) }."""
+    results = {}
+    for index, location, forecast_data, error in app.iter_route_forecasts(waypoints, app.API_KEY, **kwargs):
+        assert index not in results
+        results[index] = (location, forecast_data, error)
+    assert sorted(results) == list(range(len(waypoints)))
+    return results
+
+
+def test_group_waypoints(weather_app):
+    app, _ = weather_app()
+    waypoints = ['Тула', {'lat': 54.19, 'lon': 37.61}, ' тула ', {'lat': 54.2, 'lon': 37.62},
+                 {'lat': 55.75, 'lon': 37.62}, 'Ёлкино', 'елкино', {'lat': float('nan'), 'lon': 0}]
+
+    assert app.group_waypoints(waypoints) == {0: [2], 1: [3], 4: [], 5: [6], 7: []}
+
+
+def test_duplicate_cities_cost_one_geocode_and_one_forecast(weather_app):
+    app, server = weather_app(latency=0.05)
+    city = unique_city()
+
+    results = run_route(app, [city, city.lower(), f' {city.upper()} '], days=3)
+
+    locations = {location for location, _, _ in results.values()}
+    assert len(locations) == 1 and None not in locations
+    assert all(error is None and len(forecast) == 3 for _, forecast, error in results.values())
+    assert server.state.stats()['calls'] == {'cities/search': 1, 'daily': 1}
+
+
+def test_deadline_reports_timeout_for_pending_queued_and_waiting_points(weather_app):
+    app, _ = weather_app(latency=0.5)
+    cached, slow, queued = unique_city(), unique_city(), unique_city()
+    # Геокодирование первой точки - из кэша, она сразу ждёт прогноза
+    app.geo_cache.set(normalize_city(cached), (f'key-{cached}', -10.0, -10.0))
+
+    results = run_route(app, [cached, slow, queued], deadline=0.2, max_in_flight=2)
+
+    assert [results[index][2] for index in range(3)] == ['timeout'] * 3
+
+
+def test_geocode_exception_fails_the_whole_group(weather_app, monkeypatch):
+    app, _ = weather_app()
+    city, other = unique_city(), unique_city()
+
+    def get_location_info(city_name, api_key):
+        if city_name.casefold() == city.casefold():
+            raise RuntimeError("сбой")
+        return (f'key-{city_name}', 1.0, 1.0)
+    monkeypatch.setattr(app, 'get_location_info', get_location_info)
+
+    results = run_route(app, [city, other, city.upper()])
+
+    assert results[0][2] == results[2][2] == 'failed'
+    assert results[1][2] is None
+
+
+def test_forecast_exception_fails_every_point_waiting_for_it(weather_app, monkeypatch):
+    app, _ = weather_app()
+
+    def get_daily_forecast(location_key, api_key, days=1):
+        raise RuntimeError("сбой")
+    monkeypatch.setattr(app, 'get_daily_forecast', get_daily_forecast)
+    city = unique_city()
+
+    results = run_route(app, [city, city.lower()])
+
+    assert [error for _, _, error in results.values()] == ['failed', 'failed']
+
+
+def test_far_group_member_is_geocoded_separately(weather_app, monkeypatch):
+    app, _ = weather_app()
+    calls = []
+
+    def get_location_by_coords(lat, lon, api_key):
+        # Ближайшая локация на 0.03 градуса (~3.3 км) западнее запрошенной точки
+        calls.append((lat, lon))
+        return (f'key-{len(calls)}', lat, lon - 0.03)
+    monkeypatch.setattr(app, 'get_location_by_coords', get_location_by_coords)
+    monkeypatch.setattr(app, 'get_daily_forecast', lambda location_key, api_key, days=1: [])
+
+    # Вторая точка в 4.4 км от первой (та же группа), но в 7.8 км от найденной локации
+    results = run_route(app, [{'lat': 0, 'lon': 0}, {'lat': 0, 'lon': 0.04}, {'lat': 0, 'lon': 0.01}])
+
+    assert calls == [(0, 0), (0, 0.04)]
+    assert results[0][0][0] == results[2][0][0] == 'key-1'
+    assert results[1][0][0] == 'key-2'
+
+
+@pytest.fixture
+def client(weather_app):
+    app, server = weather_app()
+    return app, server, app.app.test_client()
+
+
+def test_weather_form_keeps_input_order_with_repeated_stops(client):
+    app, server, test_client = client
+    first, second, missing = unique_city(), unique_city(), unique_city('notfound')
+
+    response = test_client.post('/weather', data={'cities': [first, second, missing, first, ''], 'days': 1})
+
+    assert response.status_code == 200
+    with test_client.session_transaction() as session:
+        route = app.route_store.get(session['route_id'])
+        flashes = [message for _, message in session.get('_flashes', [])]
+    assert route['cities_order'] == [first, second, first]
+    assert set(route['series']) == set(route['coords_data']) == {first, second}
+    assert flashes == [f"Не удалось найти город: {missing}"]
+    assert server.state.stats()['calls'] == {'cities/search': 3, 'daily': 2}
+
+
+def test_upstream_failure_is_not_reported_as_not_found(weather_app, monkeypatch):
+    app, _ = weather_app(error_rate=1.0)
+    monkeypatch.setattr(app.aw_client, 'max_retries', 0)
+
+    results = run_route(app, [unique_city(), {'lat': -33.3, 'lon': 151.1}])
+
+    assert [error for _, _, error in results.values()] == ['upstream', 'upstream']
+
+
+def test_forecast_failure_without_stale_data_is_upstream(weather_app, monkeypatch):
+    app, _ = weather_app()
+    city = unique_city()
+    app.geo_cache.set(normalize_city(city), (f'key-{city}', -20.0, -20.0))
+    monkeypatch.setattr(app.aw_client, 'max_retries', 0)
+    monkeypatch.setattr(app.aw_client, 'base_url', 'http://127.0.0.1:9')  # соединение отклоняется
+
+    results = run_route(app, [city])
+
+    assert results[0][2] == 'upstream'
+
+
+def test_exhausted_quota_is_reported_to_the_user(client, monkeypatch, tmp_path):
+    from accuweather import DailyQuota
+    app, server, test_client = client
+    monkeypatch.setattr(app.aw_client, 'daily_quota', DailyQuota(0, str(tmp_path / 'quota.sqlite3')))
+    city = unique_city()
+
+    response = test_client.post('/weather', data={'cities': [city]})
+
+    assert response.status_code == 200
+    with test_client.session_transaction() as session:
+        flashes = [message for _, message in session.get('_flashes', [])]
+    assert flashes == [f"{app.WAYPOINT_ERRORS['quota']}, не удалось получить прогноз для города: {city}"]
+    assert server.state.stats()['total'] == 0
@@ -0,0 +1,35 @@
+"""Хранилище маршрутов для Dash: вытеснение по LRU и TTL."""
+import pytest
+
+from route_store import MemoryRouteStore, SqliteRouteStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'memory':
+            return MemoryRouteStore(**kwargs)
+        return SqliteRouteStore(str(tmp_path / 'routes.sqlite3'), **kwargs)
+    return make
+
+
+def test_route_store_evicts_least_recently_used(make_store, monkeypatch):
+    store = make_store(ttl=3600, max_entries=2)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr('route_store.time.time', lambda: next(clock))
+
+    store.set('a', {'cities_order': ['A']})
+    store.set('b', {'cities_order': ['B']})
+    assert store.get('a') == {'cities_order': ['A']}
+    store.set('c', {'cities_order': ['C']})
+
+    assert store.get('b') is None
+    assert store.get('a') == {'cities_order': ['A']}
+    assert store.get('c') == {'cities_order': ['C']}
+
+
+def test_route_store_expires_entries(make_store):
+    store = make_store(ttl=-1, max_entries=10)
+    store.set('a', {'cities_order': ['A']})
+
+    assert store.get('a') is None
@@ -0,0 +1,44 @@
+"""Пространственный индекс и расстановка точек вдоль ломаной."""
+import pytest
+
+from spatial import SpatialIndex, haversine_km, is_valid_point, resample_polyline
+
+
+def test_resample_keeps_endpoints_and_spacing():
+    points = [(0.0, 0.0), (0.0, 1.0), (1.0, 1.0)]
+
+    result = resample_polyline(points, 25)
+
+    assert result[0] == points[0]
+    assert result[-1] == points[-1]
+    steps = [haversine_km(*a, *b) for a, b in zip(result, result[1:])]
+    # Внутренние шаги - ровно spacing_km по ломаной; на изломе хорда чуть короче
+    assert all(step <= 25 + 1e-6 for step in steps)
+    assert sum(steps[:4]) == pytest.approx(100, rel=1e-6)
+
+
+def test_resample_short_polyline():
+    assert resample_polyline([(10.0, 20.0)], 5) == [(10.0, 20.0)]
+    assert resample_polyline([(10.0, 20.0), (10.0, 20.01)], 50) == [(10.0, 20.0), (10.0, 20.01)]
+
+
+def test_resample_crosses_antimeridian_the_short_way():
+    result = resample_polyline([(0.0, 179.5), (0.0, -179.5)], 30)
+
+    assert len(result) == 5
+    assert all(abs(lon) >= 179.5 for _, lon in result)
+
+
+def test_nearest_wraps_longitude():
+    index = SpatialIndex()
+    index.insert('east', 10.0, 179.99)
+
+    assert index.nearest(10.0, -179.99, 5)[0] == 'east'
+    assert index.nearest(10.0, 179.5, 5) is None
+
+
+@pytest.mark.parametrize('lat, lon', [
+    (float('nan'), 0), (1e308, 0), (0, float('inf')), (True, 0), (91, 0), (0, -181), ('1', 2), (None, 0),
+])
+def test_invalid_points(lat, lon):
+    assert not is_valid_point(lat, lon)
@@ -0,0 +1,26 @@
+"""Запуск приложения: обязательные настройки."""
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def import_app(tmp_path, **env):
+    env = dict(os.environ, CACHE_DIR=str(tmp_path), **env)
+    # Пустая переменная окружения не перезаписывается значением из .env
+    return subprocess.run([sys.executable, '-c', f'import sys; sys.path.insert(0, {ROOT!r}); import app'],
+                          cwd=str(tmp_path), env=env, capture_output=True, text=True)
+
+
+def test_app_refuses_to_start_without_secret_key(tmp_path):
+    result = import_app(tmp_path, SECRET_KEY='')
+
+    assert result.returncode != 0
+    assert "Не задан SECRET_KEY" in result.stderr
+
+
+def test_app_starts_with_secret_key(tmp_path):
+    result = import_app(tmp_path, SECRET_KEY='test')
+
+    assert result.returncode == 0, result.stderr